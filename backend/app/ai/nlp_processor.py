@@ -411,10 +411,15 @@ class NLPProcessor:
             # Get relevant schema context
             schema_context = ""
             if self.schema_context and schema_info:
+                # Chroma calls block, so run them off the event loop
                 # Index schema if not already indexed
-                self.schema_context.index_schema(schema_info)
-                # Get relevant context for the query
-                schema_context = self.schema_context.get_relevant_context(query, limit=20)
+                await asyncio.to_thread(self.schema_context.index_schema, schema_info)
+                # Get relevant context for the query (one search covers schema
+                # elements and query patterns)
+                prompt_context = await asyncio.to_thread(
+                    self.schema_context.get_prompt_context, query, 20
+                )
+                schema_context = prompt_context['context']
             elif schema_info:
                 # Build basic context without ChromaDB
                 schema_context = self._build_basic_schema_context(schema_info)
@@ -435,7 +440,7 @@ class NLPProcessor:
             
             # Step 4: Update schema context with successful query
             if sql and self.schema_context:
-                self.schema_context.update_with_query_results(query, sql, True)
+                await asyncio.to_thread(self.schema_context.update_with_query_results, query, sql, True)
             
             # Step 5: Store successful result for adaptive learning
             if sql and confidence > 0.7:
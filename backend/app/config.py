@@ -47,6 +47,7 @@ class Settings(BaseSettings):
     # Performance Settings
     chunk_size: int = Field(default=10000, env="CHUNK_SIZE")
     max_result_size: int = Field(default=100000, env="MAX_RESULT_SIZE")
+    schema_hash_algorithm: str = Field(default="sha256", env="SCHEMA_HASH")  # sha256 or blake3
     
     # LLM Configuration
     use_local_llm: bool = Field(default=False, env="USE_LOCAL_LLM")
@@ -61,6 +62,9 @@ class Settings(BaseSettings):
     # ChromaDB Configuration
     chroma_persist_path: str = Field(default="./chroma_db", env="CHROMA_PERSIST_PATH")
     chroma_collection_prefix: str = Field(default="sqlai_", env="CHROMA_COLLECTION_PREFIX")
+    chroma_host: Optional[str] = Field(default=None, env="CHROMA_HOST")  # Use a `chroma run` server instead of in-process
+    chroma_port: int = Field(default=8001, env="CHROMA_PORT")  # 8000 is the API server
+    tei_url: Optional[str] = Field(default=None, env="TEI_URL")  # text-embeddings-inference server for MiniLM
     
     # Master Key (for compatibility)
     sqlai_master_key: str = Field(default="sqlai-fixed-master-key-2024-v1", env="SQLAI_MASTER_KEY")
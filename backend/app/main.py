@@ -2,7 +2,7 @@ from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import logging
 from contextlib import asynccontextmanager
 import uuid
@@ -48,7 +48,9 @@ app = FastAPI(
     debug=settings.debug,
     lifespan=lifespan,
     docs_url="/api/docs" if settings.debug else None,
-    redoc_url="/api/redoc" if settings.debug else None
+    redoc_url="/api/redoc" if settings.debug else None,
+    # Route responses are rendered with orjson (NaN and Infinity become null)
+    default_response_class=ORJSONResponse
 )
 
 # Register exception handlers
@@ -635,4 +635,14 @@ class CacheService:
                 
         except Exception as e:
             logger.error(f"Error getting cache for {key}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+# Global instance
+_cache_service: Optional[CacheService] = None
+
+def get_cache_service() -> CacheService:
+    """Get or create the global cache service instance"""
+    global _cache_service
+    if _cache_service is None:
+        _cache_service = CacheService()
+    return _cache_service
@@ -543,3 +543,13 @@ class PostgresInspector:
                 }
             
             return {}
+
+# Global instance
+_postgres_inspector: Optional[PostgresInspector] = None
+
+def get_postgres_inspector() -> PostgresInspector:
+    """Get or create the global PostgreSQL inspector instance"""
+    global _postgres_inspector
+    if _postgres_inspector is None:
+        _postgres_inspector = PostgresInspector()
+    return _postgres_inspector
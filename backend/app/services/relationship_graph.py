@@ -125,6 +125,32 @@ class RelationshipGraphBuilder:
             logger.warning(f"No path found from {from_table} to {to_table}")
             return []
     
+    def find_join_paths_bulk(self, tables: List[str], max_hops: int = 4) -> Dict[Tuple[str, str], int]:
+        """
+        Find which pairs of tables can be joined, with one bounded search per table
+        
+        Args:
+            tables: Table names to connect
+            max_hops: Maximum number of joins allowed
+            
+        Returns:
+            Dictionary mapping (from_table, to_table) to the number of joins needed
+        """
+        if not self.graph:
+            raise ValueError("Graph not built. Call build_graph() first")
+        
+        targets = {self._normalize_table_name(t) for t in tables}
+        targets.intersection_update(self.graph.nodes)
+        
+        join_paths = {}
+        for source in targets:
+            lengths = nx.single_source_shortest_path_length(self.graph, source, cutoff=max_hops)
+            for target in targets.intersection(lengths):
+                if target != source:
+                    join_paths[(source, target)] = lengths[target]
+        
+        return join_paths
+    
     def find_related_tables(self, table_name: str, depth: int = 1) -> Dict[str, List[str]]:
         """
         Find all tables related to a given table up to specified depth
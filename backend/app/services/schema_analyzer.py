@@ -6,14 +6,113 @@ import logging
 from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 import re
+import sys
 from collections import defaultdict, Counter
+from dataclasses import dataclass, field
 
 from app.services.postgres_inspector import PostgresInspector
 from app.services.cache_service import CacheService
-from app.models import TableCache, ColumnCache, RelationshipCache
+from app.models import get_session, TableCache, ColumnCache, RelationshipCache
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class ColumnInfo:
+    """Column metadata used by the analyzers"""
+    name: str
+    type: str
+    nullable: bool = False
+    is_primary_key: bool = False
+    is_foreign_key: bool = False
+
+@dataclass(slots=True)
+class IndexInfo:
+    """Index metadata used by the analyzers"""
+    name: str
+    definition: str = ''
+
+@dataclass(slots=True)
+class TableInfo:
+    """Table metadata used by the analyzers"""
+    name: str
+    columns: List[ColumnInfo] = field(default_factory=list)
+    indexes: List[IndexInfo] = field(default_factory=list)
+    row_count: int = 0
+    size_bytes: int = 0
+    has_primary_key: bool = False
+
+@dataclass(slots=True)
+class RelationshipInfo:
+    """Foreign key relationship used by the analyzers"""
+    from_schema: str
+    from_table: str
+    to_schema: str
+    to_table: str
+    type: str = 'unknown'
+
+@dataclass(slots=True)
+class SchemaData:
+    """Tables and relationships of a single schema"""
+    tables: List[TableInfo] = field(default_factory=list)
+    relationships: List[RelationshipInfo] = field(default_factory=list)
+
+@dataclass(slots=True)
+class SchemaInfo:
+    """Typed view of PostgresInspector.analyze_schema output"""
+    schemas: Dict[str, SchemaData] = field(default_factory=dict)
+    total_tables: int = 0
+    total_columns: int = 0
+    total_relationships: int = 0
+
+    @classmethod
+    def from_dict(cls, schema_info: Dict[str, Any]) -> 'SchemaInfo':
+        """Convert the inspector's nested dicts once, interning repeated names"""
+        intern = sys.intern
+        schemas = {}
+
+        for schema_name, schema_data in schema_info.get('schemas', {}).items():
+            tables = [
+                TableInfo(
+                    name=intern(table['name']),
+                    columns=[
+                        ColumnInfo(
+                            name=column['name'],
+                            type=intern(column['type']),
+                            nullable=column.get('nullable', False),
+                            is_primary_key=column.get('is_primary_key', False),
+                            is_foreign_key=column.get('is_foreign_key', False)
+                        )
+                        for column in table.get('columns', [])
+                    ],
+                    indexes=[
+                        IndexInfo(name=index.get('name', ''), definition=index.get('definition', ''))
+                        for index in table.get('indexes', [])
+                    ],
+                    row_count=table.get('row_count', 0),
+                    size_bytes=table.get('size_bytes', 0),
+                    has_primary_key=table.get('has_primary_key', False)
+                )
+                for table in schema_data.get('tables', [])
+            ]
+            relationships = [
+                RelationshipInfo(
+                    from_schema=intern(rel['from_schema']),
+                    from_table=intern(rel['from_table']),
+                    to_schema=intern(rel['to_schema']),
+                    to_table=intern(rel['to_table']),
+                    type=rel.get('type', 'unknown')
+                )
+                for rel in schema_data.get('relationships', [])
+            ]
+            schemas[intern(schema_name)] = SchemaData(tables=tables, relationships=relationships)
+
+        return cls(
+            schemas=schemas,
+            total_tables=schema_info.get('total_tables', 0),
+            total_columns=schema_info.get('total_columns', 0),
+            total_relationships=schema_info.get('total_relationships', 0)
+        )
+
 class SchemaAnalyzer:
     """Advanced schema analysis with pattern recognition"""
     
@@ -34,6 +133,12 @@ class SchemaAnalyzer:
             'employee': ['employee', 'employees', 'calisan', 'calisanlar', 'staff'],
             'inventory': ['inventory', 'stock', 'stok', 'envanter', 'warehouse']
         }
+        # Flattened pattern -> entity type lookup, grouped in entity_patterns order
+        self._pattern_to_entity = {
+            pattern: entity_type
+            for entity_type, patterns in self.entity_patterns.items()
+            for pattern in patterns
+        }
         
         # Common column patterns
         self.column_patterns = {
@@ -48,6 +153,7 @@ class SchemaAnalyzer:
             'address': r'^(address|.*_address|adres|.*_adres|location)$',
             'quantity': r'^(quantity|qty|.*_qty|miktar|.*_miktar|adet|count)$'
         }
+        self._exact_terms, self._suffix_terms, self._regex_terms = self._split_column_patterns()
         
         # Turkish naming patterns
         self.turkish_patterns = {
@@ -81,6 +187,9 @@ class SchemaAnalyzer:
         # Get basic schema information
         schema_info = self.inspector.analyze_schema(db_id)
         
+        # Convert once so the analyzers work on typed attributes instead of dict lookups
+        typed_schema = SchemaInfo.from_dict(schema_info)
+        
         # Enhanced analysis
         analysis_result = {
             **schema_info,
@@ -93,16 +202,16 @@ class SchemaAnalyzer:
         
         if deep_analysis:
             # Analyze patterns
-            analysis_result['patterns'] = self._analyze_patterns(schema_info)
+            analysis_result['patterns'] = self._analyze_patterns(typed_schema)
             
             # Generate statistics
-            analysis_result['statistics'] = self._generate_statistics(schema_info)
+            analysis_result['statistics'] = self._generate_statistics(typed_schema)
             
             # Generate insights
-            analysis_result['insights'] = self._generate_insights(schema_info)
+            analysis_result['insights'] = self._generate_insights(typed_schema)
             
             # Generate recommendations
-            analysis_result['recommendations'] = self._generate_recommendations(schema_info)
+            analysis_result['recommendations'] = self._generate_recommendations(typed_schema)
         
         # Calculate analysis time
         analysis_time = (datetime.now() - start_time).total_seconds()
@@ -115,7 +224,7 @@ class SchemaAnalyzer:
         
         return analysis_result
     
-    def _analyze_patterns(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_patterns(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Analyze naming patterns and conventions"""
         patterns = {
             'naming_convention': self._detect_naming_convention(schema_info),
@@ -127,7 +236,7 @@ class SchemaAnalyzer:
         
         return patterns
     
-    def _detect_naming_convention(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _detect_naming_convention(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Detect naming conventions used in the database"""
         conventions = {
             'table_naming': 'unknown',
@@ -140,11 +249,11 @@ class SchemaAnalyzer:
         table_names = []
         column_names = []
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                table_names.append(table['name'])
-                for column in table.get('columns', []):
-                    column_names.append(column['name'])
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                table_names.append(table.name)
+                for column in table.columns:
+                    column_names.append(column.name)
         
         if table_names:
             # Check case style
@@ -180,24 +289,27 @@ class SchemaAnalyzer:
         
         return conventions
     
-    def _identify_entity_types(self, schema_info: Dict[str, Any]) -> Dict[str, List[str]]:
+    def _identify_entity_types(self, schema_info: SchemaInfo) -> Dict[str, List[str]]:
         """Identify entity types from table names"""
         entity_mapping = defaultdict(list)
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                table_name_lower = table['name'].lower()
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                table_name = table.name
+                table_name_lower = table_name.lower()
                 
-                # Check against known patterns
-                for entity_type, patterns in self.entity_patterns.items():
-                    for pattern in patterns:
-                        if pattern in table_name_lower:
-                            entity_mapping[entity_type].append(f"{schema_name}.{table['name']}")
-                            break
+                # Check against known patterns, recording each entity type at most once
+                matched_type = None
+                for pattern, entity_type in self._pattern_to_entity.items():
+                    if entity_type == matched_type:
+                        continue
+                    if pattern in table_name_lower:
+                        entity_mapping[entity_type].append(f"{schema_name}.{table_name}")
+                        matched_type = entity_type
         
         return dict(entity_mapping)
     
-    def _analyze_relationship_patterns(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_relationship_patterns(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Analyze relationship patterns in the database"""
         patterns = {
             'total_relationships': 0,
@@ -210,15 +322,15 @@ class SchemaAnalyzer:
         table_connections = defaultdict(int)
         total_tables = 0
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            total_tables += len(schema_data.get('tables', []))
+        for schema_name, schema_data in schema_info.schemas.items():
+            total_tables += len(schema_data.tables)
             
-            for relationship in schema_data.get('relationships', []):
+            for relationship in schema_data.relationships:
                 patterns['total_relationships'] += 1
-                patterns['relationship_types'][relationship.get('type', 'unknown')] += 1
+                patterns['relationship_types'][relationship.type] += 1
                 
-                from_table = f"{relationship['from_schema']}.{relationship['from_table']}"
-                to_table = f"{relationship['to_schema']}.{relationship['to_table']}"
+                from_table = f"{relationship.from_schema}.{relationship.from_table}"
+                to_table = f"{relationship.to_schema}.{relationship.to_table}"
                 
                 table_connections[from_table] += 1
                 table_connections[to_table] += 1
@@ -232,9 +344,9 @@ class SchemaAnalyzer:
             ]
         
         # Find isolated tables
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                full_table_name = f"{schema_name}.{table['name']}"
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                full_table_name = f"{schema_name}.{table.name}"
                 if full_table_name not in table_connections:
                     patterns['isolated_tables'].append(full_table_name)
         
@@ -245,7 +357,7 @@ class SchemaAnalyzer:
         
         return patterns
     
-    def _analyze_column_patterns(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_column_patterns(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Analyze column naming and type patterns"""
         patterns = {
             'common_columns': Counter(),
@@ -260,36 +372,44 @@ class SchemaAnalyzer:
         nullable_columns = 0
         foreign_key_columns = 0
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                for column in table.get('columns', []):
+        # Bind hot containers and methods to locals for the per-column loop
+        common_columns = patterns['common_columns']
+        data_type_distribution = patterns['data_type_distribution']
+        semantic_types = patterns['semantic_types']
+        primary_key_types = patterns['primary_key_types']
+        classify = self._classify_column_name
+        intern = sys.intern
+        
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                table_name = table.name
+                for column in table.columns:
                     total_columns += 1
-                    column_name_lower = column['name'].lower()
+                    column_name = column.name
+                    column_name_lower = intern(column_name.lower())
+                    column_type = column.type
                     
                     # Track common column names
-                    patterns['common_columns'][column_name_lower] += 1
+                    common_columns[column_name_lower] += 1
                     
                     # Track data types
-                    patterns['data_type_distribution'][column['type']] += 1
+                    data_type_distribution[column_type] += 1
                     
                     # Identify semantic types
-                    for semantic_type, pattern in self.column_patterns.items():
-                        if re.match(pattern, column_name_lower):
-                            patterns['semantic_types'][semantic_type].append(
-                                f"{table['name']}.{column['name']}"
-                            )
-                            break
+                    semantic_type = classify(column_name_lower)
+                    if semantic_type:
+                        semantic_types[semantic_type].append(f"{table_name}.{column_name}")
                     
                     # Track nullable columns
-                    if column.get('nullable', False):
+                    if column.nullable:
                         nullable_columns += 1
                     
                     # Track primary key types
-                    if column.get('is_primary_key', False):
-                        patterns['primary_key_types'][column['type']] += 1
+                    if column.is_primary_key:
+                        primary_key_types[column_type] += 1
                     
                     # Track foreign keys
-                    if column.get('is_foreign_key', False):
+                    if column.is_foreign_key:
                         foreign_key_columns += 1
         
         # Calculate percentages
@@ -305,7 +425,53 @@ class SchemaAnalyzer:
         
         return patterns
     
-    def _detect_turkish_usage(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _split_column_patterns(self) -> Tuple[Dict[str, str], List[Tuple[str, str]], List[Tuple[str, Any]]]:
+        """
+        Split column_patterns into exact names and suffixes so most columns
+        can be classified without running the regex engine
+        
+        Returns:
+            (exact name -> type, [(suffix, type)] longest first, [(type, compiled regex)] fallback)
+        """
+        exact_terms = {}
+        suffix_terms = []
+        regex_terms = []
+        
+        for semantic_type, pattern in self.column_patterns.items():
+            alternatives = pattern[2:-2].split('|') if pattern.startswith('^(') and pattern.endswith(')$') else [pattern]
+            literals = [alt[2:] if alt.startswith('.*') else alt for alt in alternatives]
+            
+            # Anything that is not a plain word or '.*suffix' stays on the regex path
+            if not all(literal and re.escape(literal) == literal for literal in literals):
+                regex_terms.append((semantic_type, re.compile(pattern)))
+                continue
+            
+            for alt, literal in zip(alternatives, literals):
+                if alt.startswith('.*'):
+                    suffix_terms.append((literal, semantic_type))
+                else:
+                    exact_terms.setdefault(literal, semantic_type)
+        
+        suffix_terms.sort(key=lambda item: len(item[0]), reverse=True)
+        return exact_terms, suffix_terms, regex_terms
+    
+    def _classify_column_name(self, column_name_lower: str) -> Optional[str]:
+        """Return the semantic type of a lowercased column name, if any"""
+        semantic_type = self._exact_terms.get(column_name_lower)
+        if semantic_type:
+            return semantic_type
+        
+        for suffix, semantic_type in self._suffix_terms:
+            if column_name_lower.endswith(suffix):
+                return semantic_type
+        
+        for semantic_type, regex in self._regex_terms:
+            if regex.match(column_name_lower):
+                return semantic_type
+        
+        return None
+    
+    def _detect_turkish_usage(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Detect Turkish language usage in schema"""
         turkish_usage = {
             'uses_turkish': False,
@@ -318,9 +484,9 @@ class SchemaAnalyzer:
         english_count = 0
         turkish_count = 0
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                table_name = table['name']
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                table_name = table.name
                 
                 # Check for Turkish characters
                 if any(char in turkish_chars for char in table_name):
@@ -342,8 +508,8 @@ class SchemaAnalyzer:
                             break
                 
                 # Check columns
-                for column in table.get('columns', []):
-                    column_name = column['name']
+                for column in table.columns:
+                    column_name = column.name
                     if any(char in turkish_chars for char in column_name):
                         turkish_usage['turkish_columns'].append(f"{table_name}.{column_name}")
         
@@ -356,13 +522,13 @@ class SchemaAnalyzer:
         
         return turkish_usage
     
-    def _generate_statistics(self, schema_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_statistics(self, schema_info: SchemaInfo) -> Dict[str, Any]:
         """Generate statistical summary of the schema"""
         stats = {
-            'total_schemas': len(schema_info.get('schemas', {})),
-            'total_tables': schema_info.get('total_tables', 0),
-            'total_columns': schema_info.get('total_columns', 0),
-            'total_relationships': schema_info.get('total_relationships', 0),
+            'total_schemas': len(schema_info.schemas),
+            'total_tables': schema_info.total_tables,
+            'total_columns': schema_info.total_columns,
+            'total_relationships': schema_info.total_relationships,
             'avg_columns_per_table': 0,
             'avg_relationships_per_table': 0,
             'largest_tables': [],
@@ -374,21 +540,21 @@ class SchemaAnalyzer:
         table_columns = []
         total_size_bytes = 0
         
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
                 # Track table sizes
-                size_bytes = table.get('size_bytes', 0)
-                row_count = table.get('row_count', 0)
-                column_count = len(table.get('columns', []))
+                size_bytes = table.size_bytes
+                row_count = table.row_count
+                column_count = len(table.columns)
                 
                 table_sizes.append({
-                    'name': f"{schema_name}.{table['name']}",
+                    'name': f"{schema_name}.{table.name}",
                     'row_count': row_count,
                     'size_bytes': size_bytes
                 })
                 
                 table_columns.append({
-                    'name': f"{schema_name}.{table['name']}",
+                    'name': f"{schema_name}.{table.name}",
                     'column_count': column_count
                 })
                 
@@ -412,36 +578,36 @@ class SchemaAnalyzer:
         
         return stats
     
-    def _generate_insights(self, schema_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_insights(self, schema_info: SchemaInfo) -> List[Dict[str, Any]]:
         """Generate insights about the schema"""
         insights = []
         
         # Check for missing primary keys
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                if not table.get('has_primary_key', False):
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                if not table.has_primary_key:
                     insights.append({
                         'type': 'warning',
                         'category': 'structure',
                         'title': 'Missing Primary Key',
-                        'description': f"Table {schema_name}.{table['name']} doesn't have a primary key",
+                        'description': f"Table {schema_name}.{table.name} doesn't have a primary key",
                         'impact': 'high',
-                        'table': f"{schema_name}.{table['name']}"
+                        'table': f"{schema_name}.{table.name}"
                     })
         
         # Check for isolated tables
         isolated_tables = []
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            relationships = schema_data.get('relationships', [])
+        for schema_name, schema_data in schema_info.schemas.items():
+            relationships = schema_data.relationships
             related_tables = set()
             
             for rel in relationships:
-                related_tables.add(rel['from_table'])
-                related_tables.add(rel['to_table'])
+                related_tables.add(rel.from_table)
+                related_tables.add(rel.to_table)
             
-            for table in schema_data.get('tables', []):
-                if table['name'] not in related_tables:
-                    isolated_tables.append(f"{schema_name}.{table['name']}")
+            for table in schema_data.tables:
+                if table.name not in related_tables:
+                    isolated_tables.append(f"{schema_name}.{table.name}")
         
         if isolated_tables:
             insights.append({
@@ -454,67 +620,69 @@ class SchemaAnalyzer:
             })
         
         # Check for large tables without indexes
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                row_count = table.get('row_count', 0)
-                index_count = len(table.get('indexes', []))
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                row_count = table.row_count
+                index_count = len(table.indexes)
                 
                 if row_count > 10000 and index_count < 2:
                     insights.append({
                         'type': 'warning',
                         'category': 'performance',
                         'title': 'Large Table with Few Indexes',
-                        'description': f"Table {schema_name}.{table['name']} has {row_count} rows but only {index_count} indexes",
+                        'description': f"Table {schema_name}.{table.name} has {row_count} rows but only {index_count} indexes",
                         'impact': 'high',
-                        'table': f"{schema_name}.{table['name']}",
+                        'table': f"{schema_name}.{table.name}",
                         'row_count': row_count,
                         'index_count': index_count
                     })
         
         return insights
     
-    def _generate_recommendations(self, schema_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _generate_recommendations(self, schema_info: SchemaInfo) -> List[Dict[str, Any]]:
         """Generate recommendations for schema optimization"""
         recommendations = []
         
         # Recommend indexes for foreign key columns
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                for column in table.get('columns', []):
-                    if column.get('is_foreign_key', False):
-                        # Check if there's an index on this column
-                        has_index = False
-                        for index in table.get('indexes', []):
-                            if column['name'] in index.get('definition', ''):
-                                has_index = True
-                                break
-                        
-                        if not has_index:
-                            recommendations.append({
-                                'type': 'performance',
-                                'priority': 'high',
-                                'title': 'Add Index on Foreign Key',
-                                'description': f"Consider adding an index on {table['name']}.{column['name']} for better join performance",
-                                'sql': f"CREATE INDEX idx_{table['name']}_{column['name']} ON {schema_name}.{table['name']} ({column['name']});",
-                                'table': f"{schema_name}.{table['name']}",
-                                'column': column['name']
-                            })
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                fk_columns = [c for c in table.columns if c.is_foreign_key]
+                if not fk_columns:
+                    continue
+                
+                # Join index definitions once so each FK needs a single substring scan
+                index_definitions = '\0'.join(
+                    index.definition for index in table.indexes
+                )
+                
+                for column in fk_columns:
+                    # Check if there's an index on this column
+                    if column.name not in index_definitions:
+                        recommendations.append({
+                            'type': 'performance',
+                            'priority': 'high',
+                            'title': 'Add Index on Foreign Key',
+                            'description': f"Consider adding an index on {table.name}.{column.name} for better join performance",
+                            'sql': f"CREATE INDEX idx_{table.name}_{column.name} ON {schema_name}.{table.name} ({column.name});",
+                            'table': f"{schema_name}.{table.name}",
+                            'column': column.name
+                        })
         
         # Recommend normalization for repeated values
-        for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            for table in schema_data.get('tables', []):
-                for column in table.get('columns', []):
+        for schema_name, schema_data in schema_info.schemas.items():
+            for table in schema_data.tables:
+                for column in table.columns:
                     # Check for columns that might benefit from normalization
-                    column_name_lower = column['name'].lower()
+                    column_name_lower = column.name.lower()
                     if any(pattern in column_name_lower for pattern in ['status', 'type', 'category', 'state']):
-                        if column['type'] in ['character varying', 'text', 'varchar']:
+                        if column.type in ['character varying', 'text', 'varchar']:
                             recommendations.append({
                                 'type': 'normalization',
                                 'priority': 'medium',
                                 'title': 'Consider Normalization',
-                                'description': f"Column {table['name']}.{column['name']} might benefit from normalization into a separate lookup table",
-                                'table': f"{schema_name}.{table['name']}",
-                                'column': column['name']
+                                'description': f"Column {table.name}.{column.name} might benefit from normalization into a separate lookup table",
+                                'table': f"{schema_name}.{table.name}",
+                                'column': column.name
                             })
                             break  # Only one recommendation per table for this
         
@@ -570,7 +738,6 @@ class SchemaAnalyzer:
         tables = self.cache_service.get_tables(db_id)
         
         # Get relationships using a fresh session
-        from app.models import get_session, RelationshipCache
         with get_session() as session:
             relationships = session.query(RelationshipCache).filter_by(database_id=db_id).all()
             
@@ -580,21 +747,31 @@ class SchemaAnalyzer:
                 connection_count[rel.from_table] += 1
                 connection_count[rel.to_table] += 1
         
-        # Calculate scores
-        max_connections = max(connection_count.values()) if connection_count else 1
-        max_rows = max(t.get('row_count', 0) for t in tables) if tables else 1
-        
+        # Collect per-table inputs in one pass, tracking the maxima as we go
+        names = []
+        rows = []
+        has_pk = []
+        max_rows = 0
         for table in tables:
-            table_name = table['table_name']
-            
+            row_count = table.get('row_count', 0)
+            if row_count > max_rows:
+                max_rows = row_count
+            names.append(table['table_name'])
+            rows.append(row_count)
+            has_pk.append(table.get('has_primary_key', False))
+        
+        max_connections = max(connection_count.values(), default=1)
+        
+        # Calculate scores
+        for table_name, row_count, pk in zip(names, rows, has_pk):
             # Connection score (0.5 weight)
             connection_score = connection_count.get(table_name, 0) / max_connections * 0.5
             
             # Size score (0.3 weight)
-            size_score = (table.get('row_count', 0) / max_rows) * 0.3 if max_rows > 0 else 0
+            size_score = (row_count / max_rows) * 0.3 if max_rows > 0 else 0
             
             # Has primary key score (0.2 weight)
-            pk_score = 0.2 if table.get('has_primary_key', False) else 0
+            pk_score = 0.2 if pk else 0
             
             scores[table_name] = min(connection_score + size_score + pk_score, 1.0)
         
@@ -4,30 +4,105 @@ Detects and tracks changes in database schema over time
 """
 import logging
 import hashlib
-import json
+import io
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
-from deepdiff import DeepDiff
 
-from app.services.postgres_inspector import PostgresInspector
-from app.services.cache_service import CacheService
+from app.config import settings
+from app.services.postgres_inspector import get_postgres_inspector
+from app.services.cache_service import get_cache_service
 from app.models import get_session, SchemaSnapshot
 
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+if settings.schema_hash_algorithm == 'blake3' and BLAKE3_AVAILABLE:
+    _hash_factory = blake3
+else:
+    if settings.schema_hash_algorithm not in ('sha256', 'blake3'):
+        logger.warning(f"Unknown schema hash algorithm '{settings.schema_hash_algorithm}', using sha256")
+    elif settings.schema_hash_algorithm == 'blake3':
+        logger.warning("blake3 not available, using sha256 for schema hashing")
+    _hash_factory = hashlib.sha256
+
+# Column attributes are stored under short keys to keep snapshots compact
+_LONG_TO_SHORT = {
+    'type': 't',
+    'nullable': 'n',
+    'default': 'd',
+    'is_primary_key': 'pk',
+    'is_foreign_key': 'fk',
+    'is_unique': 'u'
+}
+_SHORT_TO_LONG = {short: long for long, short in _LONG_TO_SHORT.items()}
+
+def _shorten_column(column: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a column captured before short keys were introduced"""
+    if 'type' not in column:
+        return column
+    return {_LONG_TO_SHORT.get(key, key): value for key, value in column.items()}
+
+def _expand_column(column: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore the descriptive keys of a stored column for presentation"""
+    return {_SHORT_TO_LONG.get(key, key): value for key, value in column.items()}
+
+# Read-only stand-in for a schema that exists on only one side of a comparison
+_EMPTY_SCHEMA_DATA = {'tables': {}, 'relationships': ()}
+
+# List-valued entries of the result of _compare_schemas
+_CHANGE_LIST_KEYS = (
+    'tables_added',
+    'tables_removed',
+    'tables_modified',
+    'columns_added',
+    'columns_removed',
+    'columns_modified',
+    'indexes_added',
+    'indexes_removed',
+    'relationships_added',
+    'relationships_removed'
+)
+
+# Shared result for unchanged tables; callers only read it, so it must never be mutated
+_EMPTY_TABLE_DIFF = {
+    'modified': False,
+    'columns_added': (),
+    'columns_removed': (),
+    'columns_modified': (),
+    'indexes_added': (),
+    'indexes_removed': ()
+}
+
+def _structure_hash(structure: Any) -> str:
+    """Hash (SHA-256 or BLAKE3, see SCHEMA_HASH) of the canonical key-sorted JSON form of a structure"""
+    return _hash_factory(orjson.dumps(structure, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _keyed_by_items(records: List[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Any]]:
+    """Map flat dicts by their sorted items so they can be diffed with set operations"""
+    return {tuple(sorted(record.items())): record for record in records}
+
 class SchemaChangeDetector:
     """Detect and track schema changes"""
     
     def __init__(self):
-        self.inspector = PostgresInspector()
-        self.cache_service = CacheService()
+        # Shared instances keep connection pools alive across detectors
+        self.inspector = get_postgres_inspector()
+        self.cache_service = get_cache_service()
     
-    def capture_current_schema(self, db_id: str) -> Dict[str, Any]:
+    def capture_current_schema(self, db_id: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """
         Capture current schema state
         
         Args:
             db_id: Database connection ID
+            timestamp: Optional ISO timestamp to record (defaults to now)
             
         Returns:
             Current schema structure
@@ -39,55 +114,71 @@ class SchemaChangeDetector:
         
         # Create simplified schema structure for comparison
         schema_structure = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': timestamp or datetime.utcnow().isoformat(),
             'database_id': db_id,
             'schemas': {}
         }
         
         for schema_name, schema_data in schema_info.get('schemas', {}).items():
-            schema_structure['schemas'][schema_name] = {
-                'tables': {},
-                'relationships': []
-            }
+            tables = {}
             
-            # Capture table structures
+            # Capture table structures; columns and indexes are built by
+            # comprehensions over fixed-shape dict literals
             for table in schema_data.get('tables', []):
                 table_structure = {
-                    'columns': {},
-                    'indexes': [],
+                    'columns': {
+                        column['name']: {
+                            't': column['type'],
+                            'n': column.get('nullable', True),
+                            'd': column.get('default'),
+                            'pk': column.get('is_primary_key', False),
+                            'fk': column.get('is_foreign_key', False),
+                            'u': column.get('is_unique', False)
+                        }
+                        for column in table.get('columns', [])
+                    },
+                    'indexes': [
+                        {
+                            'name': index['name'],
+                            'is_primary': index.get('is_primary', False),
+                            'is_unique': index.get('is_unique', False)
+                        }
+                        for index in table.get('indexes', [])
+                    ],
                     'constraints': []
                 }
                 
-                # Capture columns
-                for column in table.get('columns', []):
-                    table_structure['columns'][column['name']] = {
-                        'type': column['type'],
-                        'nullable': column.get('nullable', True),
-                        'default': column.get('default'),
-                        'is_primary_key': column.get('is_primary_key', False),
-                        'is_foreign_key': column.get('is_foreign_key', False),
-                        'is_unique': column.get('is_unique', False)
-                    }
-                
-                # Capture indexes
-                for index in table.get('indexes', []):
-                    table_structure['indexes'].append({
-                        'name': index['name'],
-                        'is_primary': index.get('is_primary', False),
-                        'is_unique': index.get('is_unique', False)
-                    })
+                # Hash each table so unchanged tables can be skipped when comparing
+                table_structure['_hash'] = _structure_hash(table_structure)
                 
-                schema_structure['schemas'][schema_name]['tables'][table['name']] = table_structure
+                tables[table['name']] = table_structure
             
             # Capture relationships
-            for rel in schema_data.get('relationships', []):
-                schema_structure['schemas'][schema_name]['relationships'].append({
+            relationships = [
+                {
                     'from_table': rel['from_table'],
                     'from_column': rel['from_column'],
                     'to_table': rel['to_table'],
                     'to_column': rel['to_column'],
                     'constraint_name': rel.get('constraint_name')
+                }
+                for rel in schema_data.get('relationships', [])
+            ]
+            
+            schema_structure['schemas'][schema_name] = {
+                'tables': tables,
+                'relationships': relationships,
+                # Aggregate hash over table hashes and relationships of this schema
+                '_hash': _structure_hash({
+                    'tables': {name: table['_hash'] for name, table in tables.items()},
+                    'relationships': relationships
                 })
+            }
+        
+        # Top-level hash excludes the timestamp so identical schemas hash identically
+        schema_structure['schema_hash'] = _structure_hash({
+            name: data['_hash'] for name, data in schema_structure['schemas'].items()
+        })
         
         return schema_structure
     
@@ -103,87 +194,144 @@ class SchemaChangeDetector:
         """
         logger.info(f"Detecting schema changes for database {db_id}")
         
-        # Get current schema
-        current_schema = self.capture_current_schema(db_id)
+        # One timestamp for both the capture and the comparison
+        timestamp = datetime.utcnow().isoformat()
+        
+        # Look up the last snapshot hash in the background while the live schema is inspected
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            last_hash_future = executor.submit(self._load_last_snapshot_hash, db_id)
+            current_schema = self.capture_current_schema(db_id, timestamp)
+            last_hash = last_hash_future.result()
+        
+        if last_hash is None:
+            logger.info("No previous snapshot found, creating initial snapshot")
+            self._save_snapshot(current_schema)
+            return {
+                'has_changes': False,
+                'is_initial': True,
+                'message': 'Initial snapshot created'
+            }
+        
+        # Steady state: the stored hash matches, so skip loading and diffing schema_json
+        if last_hash == current_schema['schema_hash']:
+            return self._empty_changes(timestamp)
         
-        # Get last snapshot from cache
+        # Compare schemas
+        last_schema = self._load_last_snapshot(db_id)
+        changes = self._compare_schemas(last_schema or {}, current_schema, timestamp)
+        
+        # Save new snapshot if there are changes
+        if changes['has_changes']:
+            self._save_snapshot(current_schema, changes)
+        else:
+            # Same structure under a different hash (snapshot from an older hash
+            # format or algorithm); store the current hash so later polls
+            # short-circuit instead of diffing schema_json every time
+            self._refresh_last_snapshot(db_id, current_schema)
+        
+        return changes
+    
+    def _load_last_snapshot_hash(self, db_id: str) -> Optional[str]:
+        """
+        Load the hash of the most recent snapshot
+        
+        Args:
+            db_id: Database connection ID
+            
+        Returns:
+            Snapshot hash, or None if no snapshot exists
+        """
         with get_session() as session:
-            last_snapshot = session.query(SchemaSnapshot).filter_by(
+            last_snapshot = session.query(SchemaSnapshot.snapshot_hash).filter_by(
                 database_id=db_id
             ).order_by(SchemaSnapshot.created_at.desc()).first()
             
-            if not last_snapshot:
-                logger.info("No previous snapshot found, creating initial snapshot")
-                self._save_snapshot(current_schema)
-                return {
-                    'has_changes': False,
-                    'is_initial': True,
-                    'message': 'Initial snapshot created'
-                }
-            
-            # Compare schemas
-            changes = self._compare_schemas(last_snapshot.schema_json, current_schema)
+            return last_snapshot.snapshot_hash if last_snapshot else None
+    
+    def _load_last_snapshot(self, db_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the schema structure of the most recent snapshot
+        
+        Args:
+            db_id: Database connection ID
             
-            # Save new snapshot if there are changes
-            if changes['has_changes']:
-                self._save_snapshot(current_schema, changes)
+        Returns:
+            Stored schema structure, or None if no snapshot exists
+        """
+        # Only schema_json is needed for the comparison
+        with get_session() as session:
+            last_snapshot = session.query(SchemaSnapshot).with_entities(
+                SchemaSnapshot.schema_json,
+                SchemaSnapshot.created_at
+            ).filter_by(
+                database_id=db_id
+            ).order_by(SchemaSnapshot.created_at.desc()).first()
             
-            return changes
+            return last_snapshot.schema_json if last_snapshot else None
     
-    def _compare_schemas(self, old_schema: Dict[str, Any], new_schema: Dict[str, Any]) -> Dict[str, Any]:
+    def _empty_changes(self, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Create a changes dictionary with nothing recorded"""
+        return {
+            'has_changes': False,
+            'timestamp': timestamp or datetime.utcnow().isoformat(),
+            **{key: [] for key in _CHANGE_LIST_KEYS},
+            'summary': {}
+        }
+    
+    def _compare_schemas(self, old_schema: Dict[str, Any], new_schema: Dict[str, Any],
+                         timestamp: Optional[str] = None) -> Dict[str, Any]:
         """
         Compare two schema structures
         
         Args:
             old_schema: Previous schema structure
             new_schema: Current schema structure
+            timestamp: Optional ISO timestamp to record (defaults to now)
             
         Returns:
             Dictionary of changes
         """
-        changes = {
-            'has_changes': False,
-            'timestamp': datetime.utcnow().isoformat(),
-            'tables_added': [],
-            'tables_removed': [],
-            'tables_modified': [],
-            'columns_added': [],
-            'columns_removed': [],
-            'columns_modified': [],
-            'indexes_added': [],
-            'indexes_removed': [],
-            'relationships_added': [],
-            'relationships_removed': [],
-            'summary': {}
-        }
+        changes = self._empty_changes(timestamp)
+        
+        # Identical schema hashes mean nothing changed; snapshots taken before
+        # hashing was introduced have no hash and always get the full comparison
+        old_hash = old_schema.get('schema_hash')
+        if old_hash and old_hash == new_schema.get('schema_hash'):
+            return changes
         
         old_schemas = old_schema.get('schemas', {})
         new_schemas = new_schema.get('schemas', {})
         
         # Check each schema
-        all_schema_names = set(old_schemas.keys()) | set(new_schemas.keys())
+        all_schema_names = old_schemas.keys() | new_schemas.keys()
         
         for schema_name in all_schema_names:
-            old_schema_data = old_schemas.get(schema_name, {'tables': {}, 'relationships': []})
-            new_schema_data = new_schemas.get(schema_name, {'tables': {}, 'relationships': []})
+            old_schema_data = old_schemas.get(schema_name) or _EMPTY_SCHEMA_DATA
+            new_schema_data = new_schemas.get(schema_name) or _EMPTY_SCHEMA_DATA
+            
+            old_schema_hash = old_schema_data.get('_hash')
+            if old_schema_hash and old_schema_hash == new_schema_data.get('_hash'):
+                continue
             
             old_tables = old_schema_data.get('tables', {})
             new_tables = new_schema_data.get('tables', {})
             
+            old_table_names, new_table_names = old_tables.keys(), new_tables.keys()
+            
             # Find added tables
-            added_tables = set(new_tables.keys()) - set(old_tables.keys())
+            added_tables = new_table_names - old_table_names
             for table_name in added_tables:
                 changes['tables_added'].append(f"{schema_name}.{table_name}")
                 changes['has_changes'] = True
             
             # Find removed tables
-            removed_tables = set(old_tables.keys()) - set(new_tables.keys())
+            removed_tables = old_table_names - new_table_names
             for table_name in removed_tables:
                 changes['tables_removed'].append(f"{schema_name}.{table_name}")
                 changes['has_changes'] = True
             
             # Check modified tables
-            common_tables = set(old_tables.keys()) & set(new_tables.keys())
+            common_tables = old_table_names & new_table_names
             for table_name in common_tables:
                 old_table = old_tables[table_name]
                 new_table = new_tables[table_name]
@@ -202,47 +350,46 @@ class SchemaChangeDetector:
                     changes['has_changes'] = True
             
             # Compare relationships
-            old_rels = set(json.dumps(r, sort_keys=True) for r in old_schema_data.get('relationships', []))
-            new_rels = set(json.dumps(r, sort_keys=True) for r in new_schema_data.get('relationships', []))
+            old_rels = _keyed_by_items(old_schema_data.get('relationships', []))
+            new_rels = _keyed_by_items(new_schema_data.get('relationships', []))
             
-            added_rels = new_rels - old_rels
-            removed_rels = old_rels - new_rels
+            added_rels = new_rels.keys() - old_rels.keys()
+            removed_rels = old_rels.keys() - new_rels.keys()
             
-            for rel_json in added_rels:
-                rel = json.loads(rel_json)
-                changes['relationships_added'].append(rel)
+            for rel_key in added_rels:
+                changes['relationships_added'].append(new_rels[rel_key])
                 changes['has_changes'] = True
             
-            for rel_json in removed_rels:
-                rel = json.loads(rel_json)
-                changes['relationships_removed'].append(rel)
+            for rel_key in removed_rels:
+                changes['relationships_removed'].append(old_rels[rel_key])
                 changes['has_changes'] = True
         
-        # Generate summary
+        # Generate summary from lengths computed once
         if changes['has_changes']:
+            counts = {key: len(changes[key]) for key in _CHANGE_LIST_KEYS}
             changes['summary'] = {
                 'total_changes': (
-                    len(changes['tables_added']) + len(changes['tables_removed']) +
-                    len(changes['tables_modified']) + len(changes['relationships_added']) +
-                    len(changes['relationships_removed'])
+                    counts['tables_added'] + counts['tables_removed'] +
+                    counts['tables_modified'] + counts['relationships_added'] +
+                    counts['relationships_removed']
                 ),
                 'tables': {
-                    'added': len(changes['tables_added']),
-                    'removed': len(changes['tables_removed']),
-                    'modified': len(changes['tables_modified'])
+                    'added': counts['tables_added'],
+                    'removed': counts['tables_removed'],
+                    'modified': counts['tables_modified']
                 },
                 'columns': {
-                    'added': len(changes['columns_added']),
-                    'removed': len(changes['columns_removed']),
-                    'modified': len(changes['columns_modified'])
+                    'added': counts['columns_added'],
+                    'removed': counts['columns_removed'],
+                    'modified': counts['columns_modified']
                 },
                 'indexes': {
-                    'added': len(changes['indexes_added']),
-                    'removed': len(changes['indexes_removed'])
+                    'added': counts['indexes_added'],
+                    'removed': counts['indexes_removed']
                 },
                 'relationships': {
-                    'added': len(changes['relationships_added']),
-                    'removed': len(changes['relationships_removed'])
+                    'added': counts['relationships_added'],
+                    'removed': counts['relationships_removed']
                 }
             }
         
@@ -258,8 +405,16 @@ class SchemaChangeDetector:
             table_name: Full table name for reporting
             
         Returns:
-            Dictionary of table changes
+            Dictionary of table changes (the shared, read-only _EMPTY_TABLE_DIFF
+            when the table is unchanged)
         """
+        if old_table is new_table:
+            return _EMPTY_TABLE_DIFF
+        
+        old_table_hash = old_table.get('_hash')
+        if old_table_hash and old_table_hash == new_table.get('_hash'):
+            return _EMPTY_TABLE_DIFF
+        
         table_changes = {
             'modified': False,
             'columns_added': [],
@@ -273,9 +428,10 @@ class SchemaChangeDetector:
         new_columns = new_table.get('columns', {})
         
         # Check columns
-        added_cols = set(new_columns.keys()) - set(old_columns.keys())
-        removed_cols = set(old_columns.keys()) - set(new_columns.keys())
-        common_cols = set(old_columns.keys()) & set(new_columns.keys())
+        old_column_names, new_column_names = old_columns.keys(), new_columns.keys()
+        added_cols = new_column_names - old_column_names
+        removed_cols = old_column_names - new_column_names
+        common_cols = old_column_names & new_column_names
         
         for col in added_cols:
             table_changes['columns_added'].append(f"{table_name}.{col}")
@@ -286,29 +442,29 @@ class SchemaChangeDetector:
             table_changes['modified'] = True
         
         for col in common_cols:
-            if old_columns[col] != new_columns[col]:
+            old_column = _shorten_column(old_columns[col])
+            new_column = _shorten_column(new_columns[col])
+            if old_column != new_column:
                 table_changes['columns_modified'].append({
                     'column': f"{table_name}.{col}",
-                    'old': old_columns[col],
-                    'new': new_columns[col]
+                    'old': _expand_column(old_column),
+                    'new': _expand_column(new_column)
                 })
                 table_changes['modified'] = True
         
         # Check indexes
-        old_indexes = set(json.dumps(idx, sort_keys=True) for idx in old_table.get('indexes', []))
-        new_indexes = set(json.dumps(idx, sort_keys=True) for idx in new_table.get('indexes', []))
+        old_indexes = _keyed_by_items(old_table.get('indexes', []))
+        new_indexes = _keyed_by_items(new_table.get('indexes', []))
         
-        added_indexes = new_indexes - old_indexes
-        removed_indexes = old_indexes - new_indexes
+        added_indexes = new_indexes.keys() - old_indexes.keys()
+        removed_indexes = old_indexes.keys() - new_indexes.keys()
         
-        for idx_json in added_indexes:
-            idx = json.loads(idx_json)
-            table_changes['indexes_added'].append(f"{table_name}.{idx['name']}")
+        for idx_key in added_indexes:
+            table_changes['indexes_added'].append(f"{table_name}.{new_indexes[idx_key]['name']}")
             table_changes['modified'] = True
         
-        for idx_json in removed_indexes:
-            idx = json.loads(idx_json)
-            table_changes['indexes_removed'].append(f"{table_name}.{idx['name']}")
+        for idx_key in removed_indexes:
+            table_changes['indexes_removed'].append(f"{table_name}.{old_indexes[idx_key]['name']}")
             table_changes['modified'] = True
         
         return table_changes
@@ -321,9 +477,9 @@ class SchemaChangeDetector:
             schema_structure: Schema structure to save
             changes: Optional changes dictionary
         """
-        # Calculate hash
-        schema_json = json.dumps(schema_structure, sort_keys=True)
-        schema_hash = hashlib.sha256(schema_json.encode()).hexdigest()
+        # Reuse the content hash computed at capture time; only structures
+        # without one need to be serialized here
+        schema_hash = schema_structure.get('schema_hash') or _structure_hash(schema_structure)
         
         # Extract change counts
         change_counts = {
@@ -335,13 +491,15 @@ class SchemaChangeDetector:
             'columns_modified': 0
         }
         
-        if changes:
-            change_counts['tables_added'] = len(changes.get('tables_added', []))
-            change_counts['tables_removed'] = len(changes.get('tables_removed', []))
-            change_counts['tables_modified'] = len(changes.get('tables_modified', []))
-            change_counts['columns_added'] = len(changes.get('columns_added', []))
-            change_counts['columns_removed'] = len(changes.get('columns_removed', []))
-            change_counts['columns_modified'] = len(changes.get('columns_modified', []))
+        summary = changes.get('summary') if changes else None
+        if summary:
+            # Reuse the counts already computed by _compare_schemas
+            for kind in ('tables', 'columns'):
+                for action in ('added', 'removed', 'modified'):
+                    change_counts[f'{kind}_{action}'] = summary[kind][action]
+        elif changes:
+            for key in change_counts:
+                change_counts[key] = len(changes.get(key, []))
         
         # Save to database
         with get_session() as session:
@@ -356,6 +514,27 @@ class SchemaChangeDetector:
             
             logger.info(f"Saved schema snapshot for database {schema_structure['database_id']}")
     
+    def _refresh_last_snapshot(self, db_id: str, schema_structure: Dict[str, Any]):
+        """
+        Replace the hash and structure of the most recent snapshot in place
+        
+        Args:
+            db_id: Database connection ID
+            schema_structure: Current schema structure, equivalent to the stored one
+        """
+        with get_session() as session:
+            last_snapshot = session.query(SchemaSnapshot).filter_by(
+                database_id=db_id
+            ).order_by(SchemaSnapshot.created_at.desc()).first()
+            if last_snapshot is None:
+                return
+            
+            last_snapshot.snapshot_hash = schema_structure['schema_hash']
+            last_snapshot.schema_json = schema_structure
+            session.commit()
+            
+            logger.info(f"Refreshed schema snapshot hash for database {db_id}")
+    
     def get_change_history(self, db_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get schema change history
@@ -370,7 +549,17 @@ class SchemaChangeDetector:
         history = []
         
         with get_session() as session:
-            snapshots = session.query(SchemaSnapshot).filter_by(
+            # Select only the summary columns; schema_json can be very large
+            snapshots = session.query(
+                SchemaSnapshot.created_at,
+                SchemaSnapshot.snapshot_hash,
+                SchemaSnapshot.tables_added,
+                SchemaSnapshot.tables_removed,
+                SchemaSnapshot.tables_modified,
+                SchemaSnapshot.columns_added,
+                SchemaSnapshot.columns_removed,
+                SchemaSnapshot.columns_modified
+            ).filter_by(
                 database_id=db_id
             ).order_by(SchemaSnapshot.created_at.desc()).limit(limit).all()
             
@@ -401,77 +590,92 @@ class SchemaChangeDetector:
         
         Args:
             db_id: Database connection ID
-            from_snapshot: Optional snapshot hash to compare from
+            from_snapshot: Optional snapshot hash (or hash prefix) to compare from;
+                when given, it is diffed against the latest stored snapshot instead
+                of re-inspecting the live database
             
         Returns:
             SQL migration script
         """
-        changes = self.detect_changes(db_id)
+        changes = None
+        
+        if from_snapshot:
+            with get_session() as session:
+                old_snapshot = session.query(SchemaSnapshot.schema_json).filter(
+                    SchemaSnapshot.database_id == db_id,
+                    SchemaSnapshot.snapshot_hash.startswith(from_snapshot)
+                ).order_by(SchemaSnapshot.created_at.desc()).first()
+                
+                new_snapshot = session.query(SchemaSnapshot.schema_json).filter_by(
+                    database_id=db_id
+                ).order_by(SchemaSnapshot.created_at.desc()).first()
+            
+            if old_snapshot and new_snapshot:
+                changes = self._compare_schemas(old_snapshot.schema_json, new_snapshot.schema_json)
+            else:
+                logger.warning(f"Snapshot {from_snapshot} not found for database {db_id}, inspecting live schema")
+        
+        if changes is None:
+            changes = self.detect_changes(db_id)
         
         if not changes['has_changes']:
             return "-- No changes detected\n"
         
-        script = []
-        script.append("-- Migration script generated at " + datetime.utcnow().isoformat())
-        script.append("-- Database: " + db_id)
-        script.append("")
+        # Each stanza is written as one string, preceded by a blank line
+        script = io.StringIO()
+        script.write(f"-- Migration script generated at {datetime.utcnow().isoformat()}\n-- Database: {db_id}\n")
         
         # Generate DROP statements for removed tables
         for table in changes.get('tables_removed', []):
-            script.append(f"-- Drop table {table}")
-            script.append(f"DROP TABLE IF EXISTS {table} CASCADE;")
-            script.append("")
+            script.write(f"\n-- Drop table {table}\nDROP TABLE IF EXISTS {table} CASCADE;\n")
         
         # Generate CREATE statements for new tables
         for table in changes.get('tables_added', []):
-            script.append(f"-- Create table {table}")
-            script.append(f"-- TODO: Add CREATE TABLE statement for {table}")
-            script.append("")
+            script.write(f"\n-- Create table {table}\n-- TODO: Add CREATE TABLE statement for {table}\n")
         
         # Generate ALTER statements for modified tables
         modified_tables = set()
         
         # Add columns
         for column in changes.get('columns_added', []):
-            table_name = '.'.join(column.split('.')[:-1])
-            column_name = column.split('.')[-1]
+            table_name, _, column_name = column.rpartition('.')
             modified_tables.add(table_name)
-            script.append(f"-- Add column {column}")
-            script.append(f"ALTER TABLE {table_name} ADD COLUMN {column_name} VARCHAR(255);")
-            script.append("")
+            script.write(
+                f"\n-- Add column {column}\n"
+                f"ALTER TABLE {table_name} ADD COLUMN {column_name} VARCHAR(255);\n"
+            )
         
         # Drop columns
         for column in changes.get('columns_removed', []):
-            table_name = '.'.join(column.split('.')[:-1])
-            column_name = column.split('.')[-1]
+            table_name, _, column_name = column.rpartition('.')
             modified_tables.add(table_name)
-            script.append(f"-- Drop column {column}")
-            script.append(f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS {column_name};")
-            script.append("")
+            script.write(
+                f"\n-- Drop column {column}\n"
+                f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS {column_name};\n"
+            )
         
         # Modify columns
         for col_change in changes.get('columns_modified', []):
             if isinstance(col_change, dict):
                 column = col_change['column']
-                table_name = '.'.join(column.split('.')[:-1])
-                column_name = column.split('.')[-1]
+                table_name, _, column_name = column.rpartition('.')
                 modified_tables.add(table_name)
-                script.append(f"-- Modify column {column}")
-                script.append(f"-- TODO: Add ALTER COLUMN statement for {column}")
-                script.append("")
+                script.write(f"\n-- Modify column {column}\n-- TODO: Add ALTER COLUMN statement for {column}\n")
         
         # Add foreign key constraints
         for rel in changes.get('relationships_added', []):
-            script.append(f"-- Add foreign key constraint")
-            script.append(f"ALTER TABLE {rel['from_table']} ADD CONSTRAINT fk_{rel['from_table']}_{rel['from_column']}")
-            script.append(f"  FOREIGN KEY ({rel['from_column']}) REFERENCES {rel['to_table']}({rel['to_column']});")
-            script.append("")
+            script.write(
+                f"\n-- Add foreign key constraint\n"
+                f"ALTER TABLE {rel['from_table']} ADD CONSTRAINT fk_{rel['from_table']}_{rel['from_column']}\n"
+                f"  FOREIGN KEY ({rel['from_column']}) REFERENCES {rel['to_table']}({rel['to_column']});\n"
+            )
         
         # Drop foreign key constraints
         for rel in changes.get('relationships_removed', []):
             if rel.get('constraint_name'):
-                script.append(f"-- Drop foreign key constraint")
-                script.append(f"ALTER TABLE {rel['from_table']} DROP CONSTRAINT IF EXISTS {rel['constraint_name']};")
-                script.append("")
+                script.write(
+                    f"\n-- Drop foreign key constraint\n"
+                    f"ALTER TABLE {rel['from_table']} DROP CONSTRAINT IF EXISTS {rel['constraint_name']};\n"
+                )
         
-        return '\n'.join(script)
\ No newline at end of file
+        return script.getvalue()
\ No newline at end of file
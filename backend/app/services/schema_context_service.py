@@ -3,21 +3,174 @@ Schema Context Service using ChromaDB
 Manages schema embeddings and retrieval for LLM context
 """
 import os
+import re
 import logging
-import json
-from typing import List, Dict, Any, Optional
+import threading
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import orjson
+import httpx
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 import hashlib
 from datetime import datetime
+from operator import itemgetter
 
+from app.config import settings
 from app.services.relationship_graph import RelationshipGraphBuilder
 from app.services.schema_analyzer import SchemaAnalyzer
-from app.services.cache_service import CacheService
+from app.services.cache_service import get_cache_service
+
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Recent (query embedding, limits, context) entries kept for semantic reuse
+QUERY_CACHE_SIZE = 256
+# Cosine similarity at which a cached context is returned for a new query
+QUERY_CACHE_SIMILARITY = 0.95
+
+# HNSW settings for new collections; embeddings are normalized, so cosine
+# distance needs no norm computation per candidate
+HNSW_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 64
+}
+# Maximum distance of a relevant result per metric; for unit vectors squared
+# L2 is twice the cosine distance, so both thresholds mean the same similarity
+RELEVANCE_THRESHOLDS = {"l2": 1.0, "cosine": 0.5, "ip": 0.5}
+
+# Maximum number of tables described in an LLM context
+MAX_CONTEXT_TABLES = 20
+
+# Element types written by index_schema (query patterns share the collection)
+SCHEMA_ELEMENT_TYPES = ["table", "column", "relationship"]
+# Index metadata must outlive typical refresh intervals so stale ids can be deleted
+INDEX_METADATA_TTL = 30 * 86400
+
+# Table names following FROM or JOIN in generated SQL
+TABLE_REFERENCE_RE = re.compile(r'(?:FROM|JOIN)\s+([^\s,]+)', re.IGNORECASE)
+
+_get_name_type = itemgetter('name', 'type')
+
+# Common Turkish mappings; plural forms come first so they win at the same position
+TURKISH_NAME_HINTS = {
+    'users': 'kullanıcılar',
+    'user': 'kullanıcı',
+    'customers': 'müşteriler',
+    'customer': 'müşteri',
+    'products': 'ürünler',
+    'product': 'ürün',
+    'orders': 'siparişler',
+    'order': 'sipariş',
+    'sales': 'satışlar',
+    'sale': 'satış',
+    'dealers': 'bayiler',
+    'dealer': 'bayi'
+}
+TURKISH_NAME_RE = re.compile('|'.join(map(re.escape, TURKISH_NAME_HINTS)), re.IGNORECASE)
+
+def _element_id(prefix: str, *parts: str) -> str:
+    """Build a compact fixed-length id for an indexed element"""
+    key = "/".join(parts)
+    return f"{prefix}_{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"
+
+def _document_hash(document: str, metadata: Dict[str, Any]) -> str:
+    """Hash an indexed element so unchanged elements can be skipped on reindex"""
+    hasher = hashlib.blake2b(document.encode(), digest_size=16)
+    hasher.update(orjson.dumps(metadata, option=orjson.OPT_SORT_KEYS))
+    return hasher.hexdigest()
+
+def _schema_hash(schema_data: Dict[str, Any]) -> str:
+    """
+    Hash the canonical (key-sorted) JSON form of the indexed part of a schema
+    
+    Only 'schemas' feeds the index; analysis results also carry timestamps,
+    insights and statistics that change on every call without affecting it.
+    """
+    hasher = blake3() if BLAKE3_AVAILABLE else hashlib.blake2b(digest_size=32)
+    hasher.update(orjson.dumps(
+        schema_data.get('schemas', {}),
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    ))
+    return hasher.hexdigest()
+
+@lru_cache(maxsize=None)
+def _get_chroma_client(persist_path: str):
+    """Get the process-wide ChromaDB client for a persist path"""
+    return chromadb.PersistentClient(
+        path=persist_path,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+    )
+
+@lru_cache(maxsize=None)
+def _get_chroma_http_client(host: str, port: int):
+    """Get the process-wide client for an out-of-process ChromaDB server"""
+    return chromadb.HttpClient(
+        host=host,
+        port=port,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+class TEIEmbeddingFunction:
+    """
+    Chroma embedding function backed by a text-embeddings-inference server
+    
+    The server must serve sentence-transformers/all-MiniLM-L6-v2 so vectors
+    stay compatible with collections built by the in-process model.
+    """
+    
+    # Texts per request and concurrent requests per call
+    BATCH_SIZE = 64
+    MAX_CONCURRENCY = 8
+    
+    def __init__(self, url: str, timeout: float = 30.0):
+        """
+        Initialize the embedding client
+        
+        Args:
+            url: Base URL of the TEI server, e.g. http://localhost:8080
+            timeout: Request timeout in seconds
+        """
+        self.url = url.rstrip('/') + '/embed'
+        self.client = httpx.Client(timeout=timeout)
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.post(self.url, json={'inputs': texts, 'normalize': True})
+        response.raise_for_status()
+        return response.json()
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        batches = [input[i:i + self.BATCH_SIZE] for i in range(0, len(input), self.BATCH_SIZE)]
+        if len(batches) <= 1:
+            return self._embed_batch(input) if input else []
+        
+        with ThreadPoolExecutor(max_workers=min(self.MAX_CONCURRENCY, len(batches))) as pool:
+            return [vector for batch in pool.map(self._embed_batch, batches) for vector in batch]
+
+@lru_cache(maxsize=1)
+def _get_embedding_function():
+    """Get the process-wide embedding function (loads the MiniLM model once)"""
+    if settings.tei_url:
+        logger.info(f"Using text-embeddings-inference server at {settings.tei_url}")
+        return TEIEmbeddingFunction(settings.tei_url)
+    return embedding_functions.DefaultEmbeddingFunction()
+
 class SchemaContextService:
     """Service for managing schema context with vector embeddings"""
     
@@ -34,19 +187,17 @@ class SchemaContextService:
         persist_path = os.getenv('CHROMA_PERSIST_PATH', './chroma_db')
         collection_prefix = os.getenv('CHROMA_COLLECTION_PREFIX', 'sqlai_')
         
-        self.client = chromadb.PersistentClient(
-            path=persist_path,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        if settings.chroma_host:
+            # HNSW search and SQLite writes run in the server process
+            self.client = _get_chroma_http_client(settings.chroma_host, settings.chroma_port)
+        else:
+            self.client = _get_chroma_client(persist_path)
         
         # Create or get collection for this database
         collection_name = f"{collection_prefix}{db_id[:8]}"  # Use first 8 chars of UUID
         
         # Use default embedding function (all-MiniLM-L6-v2)
-        self.embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+        self.embedding_fn = _get_embedding_function()
         
         try:
             self.collection = self.client.get_collection(
@@ -58,14 +209,32 @@ class SchemaContextService:
             self.collection = self.client.create_collection(
                 name=collection_name,
                 embedding_function=self.embedding_fn,
-                metadata={"database_id": db_id}
+                metadata={"database_id": db_id, **HNSW_COLLECTION_METADATA}
             )
             logger.info(f"Created new collection: {collection_name}")
         
+        # Collections created before cosine became the default keep using L2
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        self.relevance_threshold = RELEVANCE_THRESHOLDS.get(space, 1.0)
+        
+        # Hash of the schema this instance last indexed or found indexed
+        self._indexed_hash: Optional[str] = None
+        
+        # Ids of stored query patterns, loaded on first update
+        self._seen_query_ids: Optional[set] = None
+        
+        # Cached collection size and recently built contexts
+        # (collection.count() is a full SQLite aggregate; the size is tracked
+        # through this instance's own writes instead)
+        self._collection_size: Optional[int] = None
+        self._query_cache: deque = deque(maxlen=QUERY_CACHE_SIZE)
+        # Contexts are built from worker threads (asyncio.to_thread)
+        self._query_cache_lock = threading.Lock()
+        
         # Initialize related services
         self.graph_builder = RelationshipGraphBuilder()
         self.schema_analyzer = SchemaAnalyzer()
-        self.cache_service = CacheService()
+        self.cache_service = get_cache_service()
         
         # Build graph for this database
         try:
@@ -81,94 +250,154 @@ class SchemaContextService:
             schema_data: Complete schema information
             force_reindex: Force reindexing even if already indexed
         """
-        if not force_reindex and self._is_indexed(schema_data):
+        schema_hash = _schema_hash(schema_data)
+        if not force_reindex and schema_hash == self._indexed_hash:
+            return
+        
+        stored_index = self._get_stored_index()
+        if not force_reindex and self._is_indexed(schema_hash, stored_index):
             logger.info("Schema already indexed and unchanged")
+            self._indexed_hash = schema_hash
             return
         
-        # Clear existing data if reindexing
+        # Clear existing schema elements if reindexing
         if force_reindex:
             try:
-                self.collection.delete(where={})
+                self.collection.delete(where={"type": {"$in": SCHEMA_ELEMENT_TYPES}})
                 logger.info("Cleared existing schema index")
             except:
                 pass
+            stored_index = {}
+        
+        documents, metadatas, ids = self._build_index_documents(schema_data)
+        
+        # Only elements whose content changed since the last index are written;
+        # the position map also collapses duplicate ids to their last entry
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        doc_hashes = {doc_id: _document_hash(documents[i], metadatas[i]) for doc_id, i in positions.items()}
+        old_hashes = stored_index.get('doc_hashes') or {}
+        changed = [i for doc_id, i in positions.items() if doc_hashes[doc_id] != old_hashes.get(doc_id)]
+        if old_hashes or force_reindex:
+            removed = list(old_hashes.keys() - doc_hashes.keys())
+        else:
+            # Nothing records what is indexed (e.g. collections built with the
+            # old readable element ids), so reconcile against the collection
+            existing_ids = self.collection.get(
+                where={"type": {"$in": SCHEMA_ELEMENT_TYPES}}, include=[]
+            )['ids']
+            removed = [doc_id for doc_id in existing_ids if doc_id not in doc_hashes]
+        
+        if removed:
+            self.collection.delete(ids=removed)
+        
+        if changed:
+            changed_documents = [documents[i] for i in changed]
+            
+            # Embed every changed document in one call so the model runs over
+            # them at once instead of being re-entered for each batch
+            embeddings = self.embedding_fn(changed_documents)
+            
+            # Upsert into ChromaDB in batches (250 is the top of Chroma's
+            # recommended range and amortizes the per-batch SQLite transaction)
+            batch_size = 250
+            for i in range(0, len(changed), batch_size):
+                batch = changed[i:i + batch_size]
+                self.collection.upsert(
+                    documents=changed_documents[i:i + batch_size],
+                    embeddings=embeddings[i:i + batch_size],
+                    metadatas=[metadatas[j] for j in batch],
+                    ids=[ids[j] for j in batch]
+                )
         
+        logger.info(f"Indexed {len(doc_hashes)} schema elements ({len(changed)} updated, {len(removed)} removed)")
+        
+        if changed or removed:
+            # Upserts over ids the stored index did not know may replace
+            # existing elements, so the size is only derived from a full diff
+            if old_hashes and self._collection_size is not None:
+                self._collection_size += len(doc_hashes.keys() - old_hashes.keys()) - len(removed)
+            else:
+                self._collection_size = None
+            
+            # Cached contexts describe the old index
+            with self._query_cache_lock:
+                self._query_cache.clear()
+        
+        # Store index metadata
+        self._save_index_metadata(schema_hash, doc_hashes)
+        self._indexed_hash = schema_hash
+    
+    def _build_index_documents(self, schema_data: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        """
+        Build the documents, metadatas and ids to index for a schema
+        
+        Args:
+            schema_data: Complete schema information
+            
+        Returns:
+            Tuple of (documents, metadatas, ids) lists of equal length
+        """
         documents = []
         metadatas = []
         ids = []
+        add_document = documents.append
+        add_metadata = metadatas.append
+        add_id = ids.append
+        schemas = schema_data.get('schemas', {})
         
         # Index tables
-        for schema_name, schema_info in schema_data.get('schemas', {}).items():
+        for schema_name, schema_info in schemas.items():
             for table in schema_info.get('tables', []):
+                table_name = table['name']
+                columns = table.get('columns', [])
+                
                 # Create searchable document for table
-                doc = self._table_to_document(table, schema_name)
-                documents.append(doc)
+                add_document(self._table_to_document(table, schema_name))
                 
                 # Metadata for filtering and context
-                metadata = {
+                add_metadata({
                     'type': 'table',
                     'schema': schema_name,
-                    'table_name': table['name'],
-                    'full_name': f"{schema_name}.{table['name']}",
+                    'table_name': table_name,
+                    'full_name': f"{schema_name}.{table_name}",
                     'row_count': table.get('row_count', 0),
-                    'column_count': len(table.get('columns', [])),
+                    'column_count': len(columns),
                     'has_primary_key': table.get('has_primary_key', False)
-                }
-                metadatas.append(metadata)
+                })
                 
                 # Unique ID for this table
-                ids.append(f"table_{schema_name}_{table['name']}")
+                add_id(_element_id('table', schema_name, table_name))
                 
                 # Also index columns individually for fine-grained search
-                for column in table.get('columns', []):
-                    col_doc = self._column_to_document(column, table['name'], schema_name)
-                    documents.append(col_doc)
-                    
-                    col_metadata = {
+                for column in columns:
+                    column_name = column['name']
+                    add_document(self._column_to_document(column, table_name, schema_name))
+                    add_metadata({
                         'type': 'column',
                         'schema': schema_name,
-                        'table_name': table['name'],
-                        'column_name': column['name'],
+                        'table_name': table_name,
+                        'column_name': column_name,
                         'data_type': column['type'],
                         'is_primary_key': column.get('is_primary_key', False),
                         'is_foreign_key': column.get('is_foreign_key', False)
-                    }
-                    metadatas.append(col_metadata)
-                    
-                    ids.append(f"column_{schema_name}_{table['name']}_{column['name']}")
+                    })
+                    add_id(_element_id('column', schema_name, table_name, column_name))
         
         # Index relationships
-        for schema_name, schema_info in schema_data.get('schemas', {}).items():
+        for schema_info in schemas.values():
             for rel in schema_info.get('relationships', []):
-                rel_doc = self._relationship_to_document(rel)
-                documents.append(rel_doc)
-                
-                rel_metadata = {
+                add_document(self._relationship_to_document(rel))
+                add_metadata({
                     'type': 'relationship',
                     'from_table': f"{rel['from_schema']}.{rel['from_table']}",
                     'to_table': f"{rel['to_schema']}.{rel['to_table']}",
                     'from_column': rel['from_column'],
                     'to_column': rel['to_column'],
                     'relationship_type': rel.get('type', 'foreign_key')
-                }
-                metadatas.append(rel_metadata)
-                
-                ids.append(f"rel_{rel['from_table']}_{rel['from_column']}_{rel['to_table']}_{rel['to_column']}")
-        
-        # Add to ChromaDB in batches
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            batch_end = min(i + batch_size, len(documents))
-            self.collection.add(
-                documents=documents[i:batch_end],
-                metadatas=metadatas[i:batch_end],
-                ids=ids[i:batch_end]
-            )
-        
-        logger.info(f"Indexed {len(documents)} schema elements")
+                })
+                add_id(_element_id('rel', rel['from_table'], rel['from_column'], rel['to_table'], rel['to_column']))
         
-        # Store index metadata
-        self._save_index_metadata(schema_data)
+        return documents, metadatas, ids
     
     def get_relevant_context(self, query: str, limit: int = 20) -> str:
         """
@@ -182,61 +411,27 @@ class SchemaContextService:
             Formatted schema context string
         """
         try:
+            # Embed the query once; reuse a cached context for near-identical queries
+            query_embedding = self._embed_query(query)
+            cached_context = self._get_cached_context(query_embedding, limit)
+            if cached_context is not None:
+                return cached_context
+            
             # Search for relevant schema elements
             results = self.collection.query(
-                query_texts=[query],
-                n_results=min(limit, self.collection.count()),
-                include=['metadatas', 'documents', 'distances']
+                query_embeddings=[query_embedding.tolist()],
+                n_results=min(limit, self._get_collection_count()),
+                include=['metadatas', 'distances']
             )
             
             if not results['ids'][0]:
                 return self._get_default_context()
             
-            # Organize results by relevance and type
-            tables = set()
-            columns = {}
-            relationships = []
-            
-            for i, metadata in enumerate(results['metadatas'][0]):
-                distance = results['distances'][0][i]
-                
-                # Only include highly relevant results (distance < 1.0)
-                if distance < 1.0:
-                    if metadata['type'] == 'table':
-                        tables.add(metadata['full_name'])
-                    elif metadata['type'] == 'column':
-                        table_key = f"{metadata['schema']}.{metadata['table_name']}"
-                        if table_key not in columns:
-                            columns[table_key] = []
-                        columns[table_key].append({
-                            'name': metadata['column_name'],
-                            'type': metadata['data_type'],
-                            'is_pk': metadata.get('is_primary_key', False),
-                            'is_fk': metadata.get('is_foreign_key', False)
-                        })
-                    elif metadata['type'] == 'relationship':
-                        relationships.append({
-                            'from': f"{metadata['from_table']}.{metadata['from_column']}",
-                            'to': f"{metadata['to_table']}.{metadata['to_column']}"
-                        })
-            
-            # Find additional related tables through relationships
-            if tables and self.graph_builder.graph:
-                for table in list(tables):
-                    try:
-                        related = self.graph_builder.find_related_tables(
-                            table.split('.')[-1], 
-                            depth=1
-                        )
-                        for rel_table in related.get('directly_related', []):
-                            if '.' not in rel_table:
-                                rel_table = f"public.{rel_table}"
-                            tables.add(rel_table)
-                    except:
-                        pass
-            
-            # Build context string
-            context = self._build_context_string(tables, columns, relationships)
+            context = self._build_context_from_results(
+                results['metadatas'][0], results['distances'][0]
+            )
+            with self._query_cache_lock:
+                self._query_cache.append((query_embedding, limit, context))
             
             return context
             
@@ -244,18 +439,168 @@ class SchemaContextService:
             logger.error(f"Error getting relevant context: {e}")
             return self._get_default_context()
     
+    def get_prompt_context(self, query: str, limit: int = 20,
+                           similar_limit: int = 5) -> Dict[str, Any]:
+        """
+        Get schema context and similar successful queries from a single search
+        
+        Schema elements and query patterns share one collection, so one
+        embedding and one HNSW traversal serve both; results are split by
+        metadata type instead of issuing a second filtered query.
+        
+        Args:
+            query: Natural language query
+            limit: Maximum number of schema results to use
+            similar_limit: Maximum number of similar queries to return
+            
+        Returns:
+            Dict with 'context' string and 'similar_queries' list
+        """
+        try:
+            # Embed the query once; reuse a cached result for near-identical queries
+            query_embedding = self._embed_query(query)
+            cache_key = (limit, similar_limit)
+            cached = self._get_cached_context(query_embedding, cache_key)
+            if cached is not None:
+                return {'context': cached['context'], 'similar_queries': list(cached['similar_queries'])}
+            
+            results = self.collection.query(
+                query_embeddings=[query_embedding.tolist()],
+                n_results=min(limit + similar_limit, self._get_collection_count()),
+                include=['metadatas', 'distances']
+            )
+            
+            metadatas = results['metadatas'][0]
+            distances = results['distances'][0]
+            if not metadatas:
+                return {'context': self._get_default_context(), 'similar_queries': []}
+            
+            schema_hits = []
+            similar_queries = []
+            for metadata, distance in zip(metadatas, distances):
+                if metadata['type'] == 'query_pattern':
+                    if metadata.get('success') and len(similar_queries) < similar_limit:
+                        similar_queries.append({
+                            'query': metadata.get('query', ''),
+                            'sql': metadata.get('sql', ''),
+                            'distance': distance
+                        })
+                elif len(schema_hits) < limit:
+                    schema_hits.append((metadata, distance))
+            
+            context = self._build_context_from_results(
+                [hit[0] for hit in schema_hits], [hit[1] for hit in schema_hits]
+            )
+            prompt_context = {'context': context, 'similar_queries': similar_queries}
+            with self._query_cache_lock:
+                self._query_cache.append((query_embedding, cache_key, prompt_context))
+            
+            return {'context': context, 'similar_queries': list(similar_queries)}
+            
+        except Exception as e:
+            logger.error(f"Error getting prompt context: {e}")
+            return {'context': self._get_default_context(), 'similar_queries': []}
+    
+    def _build_context_from_results(self, metadatas: List[Dict[str, Any]],
+                                    distances: List[float]) -> str:
+        """Build context string from query result metadatas and distances (ascending)"""
+        # Organize results by relevance and type; tables map to their best
+        # distance and keep nearest-first insertion order
+        tables: Dict[str, float] = {}
+        columns = {}
+        relationships = []
+        
+        # Chroma returns hits nearest first, so the highly relevant results
+        # are a prefix that ends where the distance reaches the threshold
+        relevant_count = bisect_left(distances, self.relevance_threshold)
+        
+        for metadata, distance in zip(metadatas[:relevant_count], distances):
+            if metadata['type'] == 'table':
+                tables.setdefault(metadata['full_name'], distance)
+            elif metadata['type'] == 'column':
+                table_key = f"{metadata['schema']}.{metadata['table_name']}"
+                if table_key not in columns:
+                    columns[table_key] = []
+                columns[table_key].append({
+                    'name': metadata['column_name'],
+                    'type': metadata['data_type'],
+                    'is_pk': metadata.get('is_primary_key', False),
+                    'is_fk': metadata.get('is_foreign_key', False)
+                })
+            elif metadata['type'] == 'relationship':
+                relationships.append({
+                    'from': f"{metadata['from_table']}.{metadata['from_column']}",
+                    'to': f"{metadata['to_table']}.{metadata['to_column']}"
+                })
+        
+        # Find additional related tables through relationships
+        # (ranked after the direct hits, at the distance of the table they relate to)
+        if tables and self.graph_builder.graph:
+            for table, distance in list(tables.items()):
+                try:
+                    related = self.graph_builder.find_related_tables(table, depth=1)
+                    for rel_table in related.get('directly_related', []):
+                        if '.' not in rel_table:
+                            rel_table = f"public.{rel_table}"
+                        tables.setdefault(rel_table, distance)
+                except:
+                    pass
+        
+        # Build context string
+        return self._build_context_string(tables, columns, relationships)
+    
+    def _get_collection_count(self) -> int:
+        """Get collection size, counting the collection only when it is unknown"""
+        if self._collection_size is None:
+            self._collection_size = self.collection.count()
+        return self._collection_size
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query as a unit-length float32 vector"""
+        vector = np.asarray(self.embedding_fn([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _get_cached_context(self, query_embedding: np.ndarray, key: Any) -> Optional[Any]:
+        """
+        Find a cached context for a semantically equivalent query
+        
+        Args:
+            query_embedding: Normalized query embedding
+            key: Result limits the context must have been built with (the
+                 limit for get_relevant_context, (limit, similar_limit) for
+                 get_prompt_context)
+            
+        Returns:
+            Cached context or None
+        """
+        with self._query_cache_lock:
+            cached = list(self._query_cache)
+        entries = [entry for entry in cached if entry[1] == key]
+        if not entries:
+            return None
+        
+        # One matrix-vector product scores every cached query
+        similarities = np.stack([entry[0] for entry in entries]) @ query_embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] >= QUERY_CACHE_SIMILARITY:
+            return entries[best][2]
+        return None
+    
     def _table_to_document(self, table: Dict[str, Any], schema_name: str) -> str:
         """Convert table information to searchable document"""
-        columns_str = ", ".join([f"{col['name']} {col['type']}" for col in table.get('columns', [])])
+        table_name = table['name']
+        columns = table.get('columns', [])
+        columns_str = ", ".join(f"{name} {col_type}" for name, col_type in map(_get_name_type, columns))
         
         # Include Turkish variations if applicable
-        turkish_hints = self._get_turkish_hints(table['name'])
+        turkish_hints = self._get_turkish_hints(table_name)
         
-        doc = f"""Table: {schema_name}.{table['name']}
+        doc = f"""Table: {schema_name}.{table_name}
 Columns: {columns_str}
 Row Count: {table.get('row_count', 'unknown')}
 {turkish_hints}
-Description: Table {table['name']} with {len(table.get('columns', []))} columns"""
+Description: Table {table_name} with {len(columns)} columns"""
         
         return doc
     
@@ -287,38 +632,20 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
     
     def _get_turkish_hints(self, name: str) -> str:
         """Get Turkish language hints for a name"""
-        hints = []
-        
-        # Common Turkish mappings
-        mappings = {
-            'users': 'kullanıcılar',
-            'user': 'kullanıcı',
-            'customers': 'müşteriler',
-            'customer': 'müşteri',
-            'products': 'ürünler',
-            'product': 'ürün',
-            'orders': 'siparişler',
-            'order': 'sipariş',
-            'sales': 'satışlar',
-            'sale': 'satış',
-            'dealers': 'bayiler',
-            'dealer': 'bayi'
-        }
-        
-        name_lower = name.lower()
-        for eng, tr in mappings.items():
-            if eng in name_lower:
-                hints.append(f"Turkish: {tr}")
-                break
-        
-        return " ".join(hints)
+        match = TURKISH_NAME_RE.search(name)
+        if match:
+            return f"Turkish: {TURKISH_NAME_HINTS[match.group(0).lower()]}"
+        return ""
     
-    def _build_context_string(self, tables: set, columns: Dict, relationships: List) -> str:
-        """Build formatted context string for LLM"""
+    def _build_context_string(self, tables: Dict[str, float], columns: Dict, relationships: List) -> str:
+        """Build formatted context string for LLM, most relevant tables first"""
         lines = ["Database Schema Context:", "=" * 50]
         
+        # Keep only the most relevant tables to bound prompt size
+        table_list = list(tables)[:MAX_CONTEXT_TABLES]
+        
         # Add tables with columns
-        for table in sorted(tables):
+        for table in table_list:
             lines.append(f"\nTable: {table}")
             
             if table in columns:
@@ -335,22 +662,23 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
                 lines.append(f"  - {rel['from']} -> {rel['to']}")
         
         # Add join hints if multiple tables
-        if len(tables) > 1:
+        if len(table_list) > 1:
             lines.append("\nJoin Hints:")
-            # Try to find join paths
-            table_list = list(tables)
-            for i in range(len(table_list) - 1):
+            # Find every joinable pair with one bounded search per table
+            join_paths = {}
+            if self.graph_builder.graph:
                 try:
-                    if self.graph_builder.graph:
-                        path = self.graph_builder.find_join_path(
-                            table_list[i].split('.')[-1],
-                            table_list[i + 1].split('.')[-1],
-                            max_hops=3
-                        )
-                        if path:
-                            lines.append(f"  - {table_list[i]} can join {table_list[i + 1]}")
-                except:
-                    pass
+                    join_paths = self.graph_builder.find_join_paths_bulk(table_list, max_hops=3)
+                except Exception as e:
+                    logger.debug(f"Could not find join paths: {e}")
+            
+            hints = [
+                f"  - {from_table} can join {to_table}"
+                for i, from_table in enumerate(table_list)
+                for to_table in table_list[i + 1:]
+                if (from_table, to_table) in join_paths or (to_table, from_table) in join_paths
+            ]
+            lines.extend(hints[:10])  # Limit join hints
         
         return "\n".join(lines)
     
@@ -361,7 +689,8 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
             results = self.collection.query(
                 query_texts=["users customers products orders sales"],
                 n_results=10,
-                where={"type": "table"}
+                where={"type": "table"},
+                include=['metadatas']
             )
             
             if results['metadatas'][0]:
@@ -372,49 +701,40 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
         
         return "Database schema information not available. Common tables: users, products, orders, customers"
     
-    def _is_indexed(self, schema_data: Dict[str, Any]) -> bool:
-        """Check if schema is already indexed"""
-        try:
-            # Generate hash of current schema
-            schema_json = json.dumps(schema_data, sort_keys=True)
-            current_hash = hashlib.sha256(schema_json.encode()).hexdigest()
-            
-            # Check stored hash
-            stored_hash = self._get_stored_hash()
-            
-            return current_hash == stored_hash
-        except:
-            return False
+    def _is_indexed(self, schema_hash: str, stored_index: Dict[str, Any]) -> bool:
+        """Check if schema with the given hash is already indexed"""
+        return stored_index.get('schema_hash') == schema_hash
     
-    def _save_index_metadata(self, schema_data: Dict[str, Any]):
-        """Save metadata about indexed schema"""
+    def _save_index_metadata(self, schema_hash: str, doc_hashes: Dict[str, str]):
+        """
+        Save metadata about indexed schema
+        
+        Args:
+            schema_hash: Hash of the indexed schema
+            doc_hashes: Content hash of every indexed element by id
+        """
         try:
-            schema_json = json.dumps(schema_data, sort_keys=True)
-            schema_hash = hashlib.sha256(schema_json.encode()).hexdigest()
-            
-            # Store in ChromaDB metadata
-            self.client.persist()
-            
-            # Also save to cache
+            # PersistentClient writes through, so only the cache needs updating
             self.cache_service.set_cache(
                 f"schema_index_hash_{self.db_id}",
-                schema_hash,
-                category='schema_index'
+                {'schema_hash': schema_hash, 'doc_hashes': doc_hashes},
+                cache_type='schema_index',
+                ttl=INDEX_METADATA_TTL
             )
             
             logger.info(f"Saved index metadata with hash: {schema_hash[:8]}...")
         except Exception as e:
             logger.error(f"Error saving index metadata: {e}")
     
-    def _get_stored_hash(self) -> Optional[str]:
-        """Get stored schema hash"""
+    def _get_stored_index(self) -> Dict[str, Any]:
+        """Get stored schema hash and per-element hashes"""
         try:
             return self.cache_service.get_cache(
                 f"schema_index_hash_{self.db_id}",
-                category='schema_index'
-            )
+                cache_type='schema_index'
+            ) or {}
         except:
-            return None
+            return {}
     
     def update_with_query_results(self, query: str, sql: str, success: bool):
         """
@@ -427,14 +747,17 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
         """
         if success:
             try:
+                # Chroma ignores re-added ids, but only after embedding the
+                # document; skip patterns that are already stored
+                doc_id = f"query_{hashlib.md5(query.encode()).hexdigest()[:8]}"
+                seen_query_ids = self._get_seen_query_ids()
+                if doc_id in seen_query_ids:
+                    return
+                
                 # Extract tables from SQL for better relevance
-                import re
-                tables = re.findall(r'FROM\s+([^\s,]+)', sql, re.IGNORECASE)
-                tables.extend(re.findall(r'JOIN\s+([^\s]+)', sql, re.IGNORECASE))
+                tables = TABLE_REFERENCE_RE.findall(sql)
                 
                 # Add successful query pattern to collection
-                doc_id = f"query_{hashlib.md5(query.encode()).hexdigest()[:8]}"
-                
                 self.collection.add(
                     documents=[f"Successful query: {query}\nSQL: {sql}\nTables: {', '.join(tables)}"],
                     metadatas=[{
@@ -446,11 +769,22 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
                     ids=[doc_id]
                 )
                 
+                seen_query_ids.add(doc_id)
+                if self._collection_size is not None:
+                    self._collection_size += 1
+                
                 logger.info(f"Added successful query pattern to context")
                 
             except Exception as e:
                 logger.error(f"Error updating context with query results: {e}")
     
+    def _get_seen_query_ids(self) -> set:
+        """Get ids of stored query patterns, loading them from the collection once"""
+        if self._seen_query_ids is None:
+            stored = self.collection.get(where={"type": "query_pattern"}, include=[])
+            self._seen_query_ids = set(stored['ids'])
+        return self._seen_query_ids
+    
     def get_similar_queries(self, query: str, limit: int = 5) -> List[Dict[str, str]]:
         """
         Find similar successful queries
@@ -466,7 +800,8 @@ Description: Foreign key relationship from {rel['from_table']} to {rel['to_table
             results = self.collection.query(
                 query_texts=[query],
                 n_results=limit,
-                where={"type": "query_pattern", "success": True}
+                where={"type": "query_pattern", "success": True},
+                include=['metadatas', 'distances']
             )
             
             similar_queries = []
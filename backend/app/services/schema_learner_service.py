@@ -3,16 +3,52 @@ Schema Learner Service
 Continuously learns from successful queries and improves understanding
 """
 import os
+import re
 import logging
 import json
 import asyncio
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import hashlib
-from collections import defaultdict
+import heapq
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
 
 logger = logging.getLogger(__name__)
 
+# Learning data is written to the cache off the request path, one save at a time
+_save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='learning-save')
+
+# Placeholders for specific values in natural language queries
+NUMBER_RE = re.compile(r'\b\d+\b')
+STRING_RE = re.compile(r'["\'].*?["\']')
+NAME_RE = re.compile(r'\b[A-Z][a-z]+\b')
+
+# Tables and selected columns in generated SQL
+FROM_RE = re.compile(r'FROM\s+([^\s,]+)', re.IGNORECASE)
+JOIN_RE = re.compile(r'JOIN\s+([^\s]+)', re.IGNORECASE)
+SELECT_RE = re.compile(r'SELECT\s+(.*?)\s+FROM', re.IGNORECASE)
+# One item of a SELECT list, capturing the part after its last qualifier dot
+SELECT_COLUMN_RE = re.compile(r'\s*(?:[^,]*\.)?([^,]*?)\s*(?:,|$)')
+
+# Common Turkish patterns and their SQL equivalents, scanned as one alternation
+TURKISH_SQL_KEYWORDS = {
+    'MAX': 'MAX',
+    'MIN': 'MIN',
+    'SUM': 'SUM',
+    'AVG': 'AVG',
+    'COUNT': 'COUNT',
+    'SELECT': 'SELECT',
+    'GROUP_BY': 'GROUP BY',
+    'ORDER_BY': 'ORDER BY'
+}
+TURKISH_SQL_RE = re.compile(
+    r'(?P<MAX>en (?:fazla|çok))|(?P<MIN>en az)|(?P<SUM>toplam)|(?P<AVG>ortalama)'
+    r'|(?P<COUNT>kaç|sayı)|(?P<SELECT>listele|göster)|(?P<GROUP_BY>grupla|göre)|(?P<ORDER_BY>sırala)'
+)
+
 class SchemaLearnerService:
     """Service that learns from query patterns and improves over time"""
     
@@ -29,9 +65,25 @@ class SchemaLearnerService:
         # Learning data structures
         self.query_patterns = defaultdict(list)  # Pattern -> List of (query, sql, success_rate)
         self.table_relationships = defaultdict(set)  # Table -> Set of related tables
-        self.column_usage = defaultdict(int)  # Column -> Usage count
+        self.column_usage = Counter()  # Column -> Usage count
         self.turkish_mappings = {}  # Turkish term -> English/SQL mapping
-        self.successful_queries = []  # History of successful queries
+        self.successful_queries = deque(maxlen=1000)  # History of recent successful queries
+        
+        # Per-pattern summaries so suggestions don't rescan every stored query
+        self._pattern_successes = defaultdict(int)  # Pattern -> Successful query count
+        self._latest_successes = {}  # Pattern -> Most recent successful query
+        self._total_queries = 0
+        self._successful_queries = 0
+        
+        # Last export, reused until the learning data changes
+        self._export_cache: Optional[Dict[str, Any]] = None
+        
+        # Background save in progress, if any
+        self._pending_save: Optional[Future] = None
+        
+        # Schema snapshot sent to the LLM, refreshed when tables are learned or every 50 queries
+        self._llm_context_key: Optional[tuple] = None
+        self._llm_context: Dict[str, Any] = {}
         
         # Initialize services
         self.llm_service = None
@@ -72,7 +124,7 @@ class SchemaLearnerService:
         try:
             # Record query pattern
             pattern = self._extract_pattern(natural_query)
-            self.query_patterns[pattern].append({
+            self._record_pattern_query(pattern, {
                 'query': natural_query,
                 'sql': sql,
                 'success': success,
@@ -97,28 +149,41 @@ class SchemaLearnerService:
                         self._analyze_with_llm(natural_query, sql)
                     )
             
-            # Save learning data periodically
-            if len(self.successful_queries) % 10 == 0:
-                self._save_learning_data()
+            # Save learning data periodically without blocking the caller
+            if self._total_queries % 10 == 0:
+                self._schedule_save()
             
         except Exception as e:
             logger.error(f"Error learning from query: {e}")
     
+    def _record_pattern_query(self, pattern: str, entry: Dict[str, Any]):
+        """Store a query under its pattern and update the pattern summaries"""
+        # Every learning update records a query first
+        self._export_cache = None
+        
+        self.query_patterns[pattern].append(entry)
+        self._total_queries += 1
+        
+        if entry['success']:
+            self._successful_queries += 1
+            self._pattern_successes[pattern] += 1
+            latest = self._latest_successes.get(pattern)
+            if latest is None or entry['timestamp'] > latest['timestamp']:
+                self._latest_successes[pattern] = entry
+    
     def _extract_pattern(self, query: str) -> str:
         """Extract pattern from natural language query"""
         # Remove specific values and normalize
-        import re
-        
         pattern = query.lower()
         
         # Replace numbers with placeholders
-        pattern = re.sub(r'\b\d+\b', '[NUMBER]', pattern)
+        pattern = NUMBER_RE.sub('[NUMBER]', pattern)
         
         # Replace quoted strings with placeholders
-        pattern = re.sub(r'["\'].*?["\']', '[STRING]', pattern)
+        pattern = STRING_RE.sub('[STRING]', pattern)
         
         # Replace names with placeholders
-        pattern = re.sub(r'\b[A-Z][a-z]+\b', '[NAME]', pattern)
+        pattern = NAME_RE.sub('[NAME]', pattern)
         
         # Remove extra spaces
         pattern = ' '.join(pattern.split())
@@ -127,11 +192,9 @@ class SchemaLearnerService:
     
     def _learn_from_successful_query(self, natural_query: str, sql: str):
         """Learn patterns from successful query"""
-        import re
-        
         # Extract tables from SQL
-        tables = re.findall(r'FROM\s+([^\s,]+)', sql, re.IGNORECASE)
-        tables.extend(re.findall(r'JOIN\s+([^\s]+)', sql, re.IGNORECASE))
+        tables = FROM_RE.findall(sql)
+        tables.extend(JOIN_RE.findall(sql))
         
         # Learn table relationships
         if len(tables) > 1:
@@ -141,52 +204,30 @@ class SchemaLearnerService:
                     self.table_relationships[table2].add(table1)
         
         # Extract and count column usage
-        columns = re.findall(r'SELECT\s+(.*?)\s+FROM', sql, re.IGNORECASE)
-        if columns:
-            for col_list in columns:
-                for col in col_list.split(','):
-                    col = col.strip().split('.')[-1]  # Get column name only
-                    if col and col != '*':
-                        self.column_usage[col] += 1
+        for col_list in SELECT_RE.findall(sql):
+            # Column names only
+            cols = [match.group(1) for match in SELECT_COLUMN_RE.finditer(col_list)]
+            self.column_usage.update(col for col in cols if col and col != '*')
         
         # Learn Turkish mappings
         self._learn_turkish_mappings(natural_query, sql)
         
-        # Add to successful queries
+        # Add to successful queries (the deque keeps only the last 1000)
         self.successful_queries.append({
             'query': natural_query,
             'sql': sql,
             'timestamp': datetime.now().isoformat()
         })
-        
-        # Keep only recent queries (last 1000)
-        if len(self.successful_queries) > 1000:
-            self.successful_queries = self.successful_queries[-1000:]
     
     def _learn_turkish_mappings(self, natural_query: str, sql: str):
         """Learn Turkish to SQL mappings"""
-        import re
-        
-        # Common Turkish patterns and their SQL equivalents
-        patterns = [
-            (r'en (fazla|çok)', 'MAX'),
-            (r'en az', 'MIN'),
-            (r'toplam', 'SUM'),
-            (r'ortalama', 'AVG'),
-            (r'kaç|sayı', 'COUNT'),
-            (r'listele|göster', 'SELECT'),
-            (r'grupla|göre', 'GROUP BY'),
-            (r'sırala', 'ORDER BY')
-        ]
-        
         query_lower = natural_query.lower()
         sql_upper = sql.upper()
         
-        for pattern, sql_keyword in patterns:
-            if re.search(pattern, query_lower) and sql_keyword in sql_upper:
-                for match in re.finditer(pattern, query_lower):
-                    turkish_term = match.group()
-                    self.turkish_mappings[turkish_term] = sql_keyword
+        for match in TURKISH_SQL_RE.finditer(query_lower):
+            sql_keyword = TURKISH_SQL_KEYWORDS[match.lastgroup]
+            if sql_keyword in sql_upper:
+                self.turkish_mappings[match.group()] = sql_keyword
     
     async def _analyze_with_llm(self, natural_query: str, sql: str):
         """Analyze query with LLM to extract insights"""
@@ -198,10 +239,7 @@ class SchemaLearnerService:
             analysis = await self.llm_service.analyze_schema({
                 'query': natural_query,
                 'sql': sql,
-                'tables': list(self.table_relationships.keys()),
-                'common_columns': [col for col, count in 
-                                 sorted(self.column_usage.items(), 
-                                       key=lambda x: x[1], reverse=True)[:10]]
+                **self._get_llm_context()
             })
             
             # Store insights
@@ -211,6 +249,18 @@ class SchemaLearnerService:
         except Exception as e:
             logger.error(f"Error analyzing with LLM: {e}")
     
+    def _get_llm_context(self) -> Dict[str, Any]:
+        """Get the known tables and top 10 columns, reusing the last snapshot while they are unchanged"""
+        key = (len(self.table_relationships), self._total_queries // 50)
+        if key != self._llm_context_key:
+            self._llm_context = {
+                'tables': list(self.table_relationships),
+                'common_columns': [col for col, count in
+                                   heapq.nlargest(10, self.column_usage.items(), key=itemgetter(1))]
+            }
+            self._llm_context_key = key
+        return self._llm_context
+    
     def get_suggestions(self, partial_query: str) -> List[Dict[str, Any]]:
         """
         Get query suggestions based on learned patterns
@@ -224,22 +274,22 @@ class SchemaLearnerService:
         suggestions = []
         pattern = self._extract_pattern(partial_query)
         
-        # Find similar patterns
+        # Find similar patterns (a prefix match is also a substring match)
         for stored_pattern, queries in self.query_patterns.items():
-            if pattern in stored_pattern or stored_pattern.startswith(pattern):
-                successful = [q for q in queries if q['success']]
-                if successful:
+            if pattern in stored_pattern:
+                successful_count = self._pattern_successes.get(stored_pattern, 0)
+                if successful_count:
                     # Calculate confidence based on success rate
-                    success_rate = len(successful) / len(queries)
+                    success_rate = successful_count / len(queries)
                     
                     # Get most recent successful query
-                    recent = max(successful, key=lambda x: x['timestamp'])
+                    recent = self._latest_successes[stored_pattern]
                     
                     suggestions.append({
                         'suggestion': recent['query'],
                         'sql': recent['sql'],
                         'confidence': success_rate,
-                        'usage_count': len(successful)
+                        'usage_count': successful_count
                     })
         
         # Sort by confidence and usage
@@ -269,8 +319,7 @@ class SchemaLearnerService:
         Returns:
             List of (column_name, usage_count) tuples
         """
-        return sorted(self.column_usage.items(), 
-                     key=lambda x: x[1], reverse=True)[:limit]
+        return heapq.nlargest(limit, self.column_usage.items(), key=itemgetter(1))
     
     def get_turkish_mappings(self) -> Dict[str, str]:
         """Get learned Turkish to SQL mappings"""
@@ -283,15 +332,20 @@ class SchemaLearnerService:
         Returns:
             Dictionary containing all learned patterns and relationships
         """
-        return {
-            'db_id': self.db_id,
-            'query_patterns': dict(self.query_patterns),
-            'table_relationships': {k: list(v) for k, v in self.table_relationships.items()},
-            'column_usage': dict(self.column_usage),
-            'turkish_mappings': self.turkish_mappings,
-            'successful_queries': self.successful_queries[-100:],  # Last 100
-            'export_time': datetime.now().isoformat()
-        }
+        if self._export_cache is None:
+            # Copies, so the cached export doesn't change as learning continues
+            self._export_cache = {
+                'db_id': self.db_id,
+                'query_patterns': {k: list(v) for k, v in self.query_patterns.items()},
+                'table_relationships': {k: list(v) for k, v in self.table_relationships.items()},
+                'column_usage': dict(self.column_usage),
+                'turkish_mappings': dict(self.turkish_mappings),
+                'successful_queries': list(islice(  # Last 100
+                    self.successful_queries, max(0, len(self.successful_queries) - 100), None
+                ))
+            }
+        
+        return {**self._export_cache, 'export_time': datetime.now().isoformat()}
     
     def import_learning_data(self, data: Dict[str, Any]):
         """
@@ -306,35 +360,55 @@ class SchemaLearnerService:
         
         # Import patterns
         for pattern, queries in data.get('query_patterns', {}).items():
-            self.query_patterns[pattern].extend(queries)
+            for entry in queries:
+                self._record_pattern_query(pattern, entry)
         
         # Import relationships
         for table, related in data.get('table_relationships', {}).items():
             self.table_relationships[table].update(related)
         
         # Import column usage
-        for column, count in data.get('column_usage', {}).items():
-            self.column_usage[column] += count
+        self.column_usage.update(data.get('column_usage', {}))
         
         # Import Turkish mappings
         self.turkish_mappings.update(data.get('turkish_mappings', {}))
         
         # Import successful queries
         self.successful_queries.extend(data.get('successful_queries', []))
+        self._export_cache = None
         
         logger.info(f"Imported learning data for database: {self.db_id}")
     
-    def _save_learning_data(self):
-        """Save learning data to cache"""
+    def _schedule_save(self):
+        """Save learning data in the background unless a save is already running"""
+        if self._pending_save is not None and not self._pending_save.done():
+            return
+        
+        # The export already copies every container; copying the pattern entries
+        # too leaves the worker nothing shared with the learner, and the only
+        # serialization happens on the worker inside set_cache
+        export = self.export_learning_data()
+        snapshot = {
+            **export,
+            'query_patterns': {k: [dict(e) for e in v] for k, v in export['query_patterns'].items()}
+        }
+        self._pending_save = _save_executor.submit(self._save_learning_data, snapshot)
+    
+    def _save_learning_data(self, data: Optional[Dict[str, Any]] = None):
+        """
+        Save learning data to cache
+        
+        Args:
+            data: Exported learning data (exported now if not given)
+        """
         try:
-            from app.services.cache_service import CacheService
-            cache = CacheService()
+            from app.services.cache_service import get_cache_service
             
             cache_key = f"learning_data_{self.db_id}"
-            cache.set_cache(
+            get_cache_service().set_cache(
                 cache_key,
-                self.export_learning_data(),
-                category='learning',
+                data if data is not None else self.export_learning_data(),
+                cache_type='learning',
                 ttl=86400  # 24 hours
             )
             
@@ -346,11 +420,10 @@ class SchemaLearnerService:
     def _load_learning_data(self):
         """Load learning data from cache"""
         try:
-            from app.services.cache_service import CacheService
-            cache = CacheService()
+            from app.services.cache_service import get_cache_service
             
             cache_key = f"learning_data_{self.db_id}"
-            data = cache.get_cache(cache_key, category='learning')
+            data = get_cache_service().get_cache(cache_key, cache_type='learning')
             
             if data:
                 self.import_learning_data(data)
@@ -366,15 +439,11 @@ class SchemaLearnerService:
         Returns:
             Dictionary with learning statistics
         """
-        total_patterns = len(self.query_patterns)
-        total_queries = sum(len(queries) for queries in self.query_patterns.values())
-        successful_queries = sum(
-            len([q for q in queries if q['success']])
-            for queries in self.query_patterns.values()
-        )
+        total_queries = self._total_queries
+        successful_queries = self._successful_queries
         
         return {
-            'total_patterns': total_patterns,
+            'total_patterns': len(self.query_patterns),
             'total_queries': total_queries,
             'successful_queries': successful_queries,
             'success_rate': successful_queries / total_queries if total_queries > 0 else 0,
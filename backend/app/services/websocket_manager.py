@@ -5,12 +5,30 @@ Handles real-time communication for query progress and notifications
 import logging
 import json
 import asyncio
+import time
+import orjson
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Dict, Set, Any, Optional
 from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
 
+def _encode_message(message: Dict[str, Any]) -> str:
+    """Serialize a message once so it can be sent to many sockets as a text frame"""
+    return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+
+@dataclass(slots=True)
+class ConnMeta:
+    """Per-connection metadata stored on websocket.state"""
+    type: str
+    user_id: Optional[str]
+    query_id: Optional[str]
+    connected_at: datetime
+    # Monotonic seconds; only used internally for idle tracking
+    last_activity: float
+
 class ConnectionManager:
     """Manages WebSocket connections"""
     
@@ -22,8 +40,12 @@ class ConnectionManager:
             'schema_updates': set()
         }
         
-        # Connection metadata
-        self.connection_metadata: Dict[WebSocket, Dict[str, Any]] = {}
+        # Query progress connections indexed by the query they follow
+        self._by_query_id: Dict[str, Set[WebSocket]] = {}
+        
+        # Sockets ordered from least to most recently active; stamps only move
+        # forward, so stale sockets are always at the front
+        self._activity_index: OrderedDict[WebSocket, None] = OrderedDict()
         
         # Message queues for different types
         self.message_queues: Dict[str, list] = {
@@ -51,15 +73,18 @@ class ConnectionManager:
             self.active_connections[connection_type] = set()
         
         self.active_connections[connection_type].add(websocket)
+        if query_id and connection_type == 'query_progress':
+            self._by_query_id.setdefault(query_id, set()).add(websocket)
         
-        # Store metadata
-        self.connection_metadata[websocket] = {
-            'type': connection_type,
-            'user_id': user_id,
-            'query_id': query_id,
-            'connected_at': datetime.utcnow(),
-            'last_activity': datetime.utcnow()
-        }
+        # Store metadata on the socket itself so per-message updates skip a dict lookup
+        websocket.state.meta = ConnMeta(
+            type=connection_type,
+            user_id=user_id,
+            query_id=query_id,
+            connected_at=datetime.utcnow(),
+            last_activity=time.monotonic()
+        )
+        self._activity_index[websocket] = None
         
         logger.info(f"WebSocket connected: {connection_type} (user: {user_id}, query: {query_id})")
         
@@ -77,15 +102,19 @@ class ConnectionManager:
         Args:
             websocket: WebSocket to disconnect
         """
-        metadata = self.connection_metadata.get(websocket, {})
-        connection_type = metadata.get('type', 'unknown')
+        meta = getattr(websocket.state, 'meta', None)
+        connection_type = meta.type if meta else 'unknown'
         
         # Remove from active connections
         if connection_type in self.active_connections:
             self.active_connections[connection_type].discard(websocket)
+        self._activity_index.pop(websocket, None)
         
-        # Remove metadata
-        self.connection_metadata.pop(websocket, None)
+        subscribers = self._by_query_id.get(meta.query_id) if meta else None
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self._by_query_id[meta.query_id]
         
         logger.info(f"WebSocket disconnected: {connection_type}")
     
@@ -97,17 +126,31 @@ class ConnectionManager:
             websocket: WebSocket to send to
             message: Message to send
         """
+        await self._send_text(websocket, _encode_message(message))
+    
+    async def _send_text(self, websocket: WebSocket, payload: str):
+        """
+        Send an already serialized message to a specific WebSocket
+        
+        Args:
+            websocket: WebSocket to send to
+            payload: JSON encoded message
+        """
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(payload)
             
-            # Update last activity
-            if websocket in self.connection_metadata:
-                self.connection_metadata[websocket]['last_activity'] = datetime.utcnow()
+            self._touch(websocket, time.monotonic())
                 
         except Exception as e:
             logger.error(f"Failed to send WebSocket message: {e}")
             await self.disconnect(websocket)
     
+    def _touch(self, websocket: WebSocket, now: float):
+        """Update last activity and move the socket to the back of the activity index"""
+        websocket.state.meta.last_activity = now
+        if websocket in self._activity_index:
+            self._activity_index.move_to_end(websocket)
+    
     async def broadcast_to_type(self, connection_type: str, message: Dict[str, Any]):
         """
         Broadcast message to all connections of a specific type
@@ -119,20 +162,23 @@ class ConnectionManager:
         if connection_type not in self.active_connections:
             return
         
-        connections = self.active_connections[connection_type].copy()
+        connections = list(self.active_connections[connection_type])
         disconnected = []
+        payload = _encode_message(message)
         
-        for websocket in connections:
-            try:
-                await websocket.send_json(message)
-                
-                # Update last activity
-                if websocket in self.connection_metadata:
-                    self.connection_metadata[websocket]['last_activity'] = datetime.utcnow()
-                    
-            except Exception as e:
-                logger.warning(f"Failed to send to WebSocket, marking for disconnect: {e}")
+        # Send concurrently so a broadcast costs one round trip rather than one per socket
+        results = await asyncio.gather(
+            *(websocket.send_text(payload) for websocket in connections),
+            return_exceptions=True
+        )
+        
+        now = time.monotonic()
+        for websocket, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send to WebSocket, marking for disconnect: {result}")
                 disconnected.append(websocket)
+            else:
+                self._touch(websocket, now)
         
         # Clean up disconnected sockets
         for websocket in disconnected:
@@ -162,12 +208,14 @@ class ConnectionManager:
         }
         
         # Send to query-specific connections
-        connections = self.active_connections.get('query_progress', set()).copy()
+        targets = self._by_query_id.get(query_id)
+        if not targets:
+            return
+        payload = _encode_message(message)
         
-        for websocket in connections:
-            metadata = self.connection_metadata.get(websocket, {})
-            if metadata.get('query_id') == query_id:
-                await self.send_message(websocket, message)
+        await asyncio.gather(*(
+            self._send_text(websocket, payload) for websocket in list(targets)
+        ))
     
     async def send_system_notification(self, notification_type: str, 
                                       message: str, severity: str = 'info'):
@@ -217,10 +265,7 @@ class ConnectionManager:
                 conn_type: len(connections) 
                 for conn_type, connections in self.active_connections.items()
             },
-            'active_queries': len([
-                ws for ws, metadata in self.connection_metadata.items()
-                if metadata.get('type') == 'query_progress' and metadata.get('query_id')
-            ])
+            'active_queries': sum(len(subscribers) for subscribers in self._by_query_id.values())
         }
         
         return stats
@@ -232,15 +277,14 @@ class ConnectionManager:
         Args:
             max_idle_minutes: Maximum idle time before disconnection
         """
-        current_time = datetime.utcnow()
+        cutoff = time.monotonic() - max_idle_minutes * 60
         stale_connections = []
         
-        for websocket, metadata in self.connection_metadata.items():
-            last_activity = metadata.get('last_activity')
-            if last_activity:
-                idle_minutes = (current_time - last_activity).total_seconds() / 60
-                if idle_minutes > max_idle_minutes:
-                    stale_connections.append(websocket)
+        # Walk from the oldest activity and stop at the first fresh socket
+        for websocket in self._activity_index:
+            if websocket.state.meta.last_activity >= cutoff:
+                break
+            stale_connections.append(websocket)
         
         for websocket in stale_connections:
             await self.disconnect(websocket)
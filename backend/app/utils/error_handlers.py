@@ -3,14 +3,16 @@ Error handlers for FastAPI application
 """
 import logging
 import traceback
-from typing import Union
+import orjson
+from typing import Any, Union
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError
 from psycopg2 import OperationalError as PsycopgOperationalError
 
+from app.config import settings
 from app.utils.exceptions import (
     SQLAIException,
     DatabaseConnectionError,
@@ -20,7 +22,33 @@ from app.utils.exceptions import (
 
 logger = logging.getLogger(__name__)
 
-async def sqlai_exception_handler(request: Request, exc: SQLAIException) -> JSONResponse:
+# Response bodies that never change, serialized once at import
+_PRECOMPILED_500 = orjson.dumps({
+    "error": "INTERNAL_SERVER_ERROR",
+    "message": "An unexpected error occurred"
+})
+_VALIDATION_BODY_PREFIX = orjson.dumps({
+    "error": "VALIDATION_ERROR",
+    "message": "Request validation failed"
+})[:-1] + b',"details":{"errors":'
+_VALIDATION_BODY_SUFFIX = b'}}'
+
+# (error code, status code, message) for specific SQLAlchemy errors, matched along the MRO
+SQLALCHEMY_ERROR_RESPONSES = {
+    OperationalError: ("DATABASE_CONNECTION_ERROR", status.HTTP_503_SERVICE_UNAVAILABLE, "Database connection failed"),
+    IntegrityError: ("DATABASE_INTEGRITY_ERROR", status.HTTP_409_CONFLICT, "Database integrity constraint violated")
+}
+SQLALCHEMY_DEFAULT_RESPONSE = ("DATABASE_ERROR", status.HTTP_500_INTERNAL_SERVER_ERROR, "Database operation failed")
+
+def _dumps(content: Any) -> bytes:
+    """Serialize response content with orjson"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+
+def _json_response(status_code: int, content: Any) -> Response:
+    """Build an error response from content pre-serialized with orjson"""
+    return Response(content=_dumps(content), status_code=status_code, media_type="application/json")
+
+async def sqlai_exception_handler(request: Request, exc: SQLAIException) -> Response:
     """
     Handle custom SQLAI exceptions
     """
@@ -34,47 +62,47 @@ async def sqlai_exception_handler(request: Request, exc: SQLAIException) -> JSON
         }
     )
     
-    return JSONResponse(
+    return _json_response(
         status_code=exc.status_code,
         content={
             "error": exc.error_code,
             "message": exc.message,
-            "details": exc.details,
-            "request_id": request.state.request_id if hasattr(request.state, "request_id") else None
+            "details": exc.details or {},
+            "request_id": getattr(request.state, "request_id", None)
         }
     )
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> Response:
     """
     Handle request validation errors
     """
-    errors = []
-    for error in exc.errors():
-        errors.append({
-            "field": ".".join(str(loc) for loc in error["loc"][1:]),
+    errors = [
+        {
+            "field": ".".join(map(str, error["loc"][1:])),
             "message": error["msg"],
             "type": error["type"]
-        })
+        }
+        for error in exc.errors()
+    ]
     
+    path = request.url.path
     logger.warning(
-        f"Validation error on {request.url.path}",
+        "Validation error on %s",
+        path,
         extra={
             "errors": errors,
-            "path": request.url.path,
+            "path": path,
             "method": request.method
         }
     )
     
-    return JSONResponse(
+    return Response(
+        content=_VALIDATION_BODY_PREFIX + orjson.dumps(errors, default=str) + _VALIDATION_BODY_SUFFIX,
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={
-            "error": "VALIDATION_ERROR",
-            "message": "Request validation failed",
-            "details": {"errors": errors}
-        }
+        media_type="application/json"
     )
 
-async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> JSONResponse:
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> Response:
     """
     Handle HTTP exceptions
     """
@@ -87,7 +115,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException)
         }
     )
     
-    return JSONResponse(
+    return _json_response(
         status_code=exc.status_code,
         content={
             "error": f"HTTP_{exc.status_code}",
@@ -95,40 +123,32 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException)
         }
     )
 
-async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -> JSONResponse:
+async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -> Response:
     """
     Handle SQLAlchemy database errors
     """
-    error_code = "DATABASE_ERROR"
-    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-    message = "Database operation failed"
-    details = {}
-    
-    if isinstance(exc, OperationalError):
-        error_code = "DATABASE_CONNECTION_ERROR"
-        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-        message = "Database connection failed"
-        details = {"error": str(exc.orig) if hasattr(exc, 'orig') else str(exc)}
-    elif isinstance(exc, IntegrityError):
-        error_code = "DATABASE_INTEGRITY_ERROR"
-        status_code = status.HTTP_409_CONFLICT
-        message = "Database integrity constraint violated"
-        details = {"error": str(exc.orig) if hasattr(exc, 'orig') else str(exc)}
+    for exc_class in type(exc).__mro__:
+        if exc_class in SQLALCHEMY_ERROR_RESPONSES:
+            error_code, status_code, message = SQLALCHEMY_ERROR_RESPONSES[exc_class]
+            details = {"error": str(exc.orig) if hasattr(exc, 'orig') else str(exc)}
+            break
     else:
+        error_code, status_code, message = SQLALCHEMY_DEFAULT_RESPONSE
         details = {"error": str(exc)}
     
-    logger.error(
-        f"SQLAlchemy Exception: {error_code}",
-        extra={
-            "error_code": error_code,
-            "details": details,
-            "path": request.url.path,
-            "method": request.method,
-            "traceback": traceback.format_exc()
-        }
-    )
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(
+            f"SQLAlchemy Exception: {error_code}",
+            exc_info=exc,
+            extra={
+                "error_code": error_code,
+                "details": details,
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
     
-    return JSONResponse(
+    return _json_response(
         status_code=status_code,
         content={
             "error": error_code,
@@ -137,7 +157,7 @@ async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError) -
         }
     )
 
-async def psycopg_exception_handler(request: Request, exc: PsycopgOperationalError) -> JSONResponse:
+async def psycopg_exception_handler(request: Request, exc: PsycopgOperationalError) -> Response:
     """
     Handle psycopg2 operational errors
     """
@@ -150,7 +170,7 @@ async def psycopg_exception_handler(request: Request, exc: PsycopgOperationalErr
         }
     )
     
-    return JSONResponse(
+    return _json_response(
         status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
         content={
             "error": "DATABASE_CONNECTION_ERROR",
@@ -159,25 +179,27 @@ async def psycopg_exception_handler(request: Request, exc: PsycopgOperationalErr
         }
     )
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> Response:
     """
     Handle all unhandled exceptions
     """
-    logger.error(
-        f"Unhandled exception: {type(exc).__name__}",
-        extra={
-            "exception_type": type(exc).__name__,
-            "exception": str(exc),
-            "path": request.url.path,
-            "method": request.method,
-            "traceback": traceback.format_exc()
-        }
-    )
+    # The log formatter renders the traceback from exc_info, only if the record is written
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(
+            f"Unhandled exception: {type(exc).__name__}",
+            exc_info=exc,
+            extra={
+                "exception_type": type(exc).__name__,
+                "exception": str(exc),
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
     
     # In development, include more details
-    from app.config import settings
     if settings.debug:
-        return JSONResponse(
+        tb_str = traceback.format_exc()
+        return _json_response(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "error": "INTERNAL_SERVER_ERROR",
@@ -185,37 +207,39 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
                 "details": {
                     "exception_type": type(exc).__name__,
                     "exception": str(exc),
-                    "traceback": traceback.format_exc().split('\n')
+                    "traceback": tb_str.split('\n')
                 }
             }
         )
     
-    return JSONResponse(
+    return Response(
+        content=_PRECOMPILED_500,
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
-            "error": "INTERNAL_SERVER_ERROR",
-            "message": "An unexpected error occurred"
-        }
+        media_type="application/json"
     )
 
-def register_exception_handlers(app):
-    """
-    Register all exception handlers with the FastAPI app
-    """
-    from fastapi import FastAPI
-    
+# Exception classes and their handlers, in registration order
+EXCEPTION_HANDLERS = (
     # Custom exceptions
-    app.add_exception_handler(SQLAIException, sqlai_exception_handler)
+    (SQLAIException, sqlai_exception_handler),
     
     # FastAPI/Starlette exceptions
-    app.add_exception_handler(RequestValidationError, validation_exception_handler)
-    app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+    (RequestValidationError, validation_exception_handler),
+    (StarletteHTTPException, http_exception_handler),
     
     # Database exceptions
-    app.add_exception_handler(SQLAlchemyError, sqlalchemy_exception_handler)
-    app.add_exception_handler(PsycopgOperationalError, psycopg_exception_handler)
+    (SQLAlchemyError, sqlalchemy_exception_handler),
+    (PsycopgOperationalError, psycopg_exception_handler),
     
     # General exception handler (catches everything else)
-    app.add_exception_handler(Exception, general_exception_handler)
+    (Exception, general_exception_handler),
+)
+
+def register_exception_handlers(app):
+    """
+    Register all exception handlers with the FastAPI app
+    """
+    for exc_class, handler in EXCEPTION_HANDLERS:
+        app.add_exception_handler(exc_class, handler)
     
     logger.info("Exception handlers registered")
\ No newline at end of file
@@ -1,170 +1,223 @@
 """
 Custom exceptions for SQLAI application
 """
+from types import MappingProxyType
 from typing import Optional, Dict, Any
 
+# Shared read-only details for exceptions raised without any
+_EMPTY_DETAILS = MappingProxyType({})
+
+def _rebuild_exception(cls, args, message, error_code, details, status_code):
+    """Recreate an unpickled exception without calling its class's __init__"""
+    exc = cls.__new__(cls)
+    exc.args = args
+    exc.message = message
+    exc.error_code = error_code
+    exc.details = details if details else _EMPTY_DETAILS
+    exc.status_code = status_code
+    return exc
+
 class SQLAIException(Exception):
     """Base exception for SQLAI application"""
     
+    __slots__ = ("message", "error_code", "details", "status_code")
+    
+    # Defaults for each exception class; instances may override them
+    _ERROR_CODE = "INTERNAL_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(
         self,
         message: str,
         error_code: Optional[str] = None,
         details: Optional[Dict[str, Any]] = None,
-        status_code: int = 500
+        status_code: Optional[int] = None
     ):
         super().__init__(message)
         self.message = message
-        self.error_code = error_code or "INTERNAL_ERROR"
-        self.details = details or {}
-        self.status_code = status_code
+        self.error_code = error_code or self._ERROR_CODE
+        self.details = details if details else _EMPTY_DETAILS
+        self.status_code = status_code if status_code is not None else self._STATUS_CODE
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert exception to dictionary for API response"""
         return {
             "error": self.error_code,
             "message": self.message,
-            "details": self.details
+            "details": self.details or {}
         }
+    
+    def __reduce__(self):
+        # Slotted attributes aren't in __dict__, and subclass __init__
+        # signatures differ, so rebuild from the stored state directly
+        return (
+            _rebuild_exception,
+            (type(self), self.args, self.message, self.error_code,
+             dict(self.details), self.status_code)
+        )
 
 class DatabaseConnectionError(SQLAIException):
     """Database connection related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "DATABASE_CONNECTION_ERROR"
+    _STATUS_CODE = 503
+    
     def __init__(self, message: str, database_id: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="DATABASE_CONNECTION_ERROR",
-            details={"database_id": database_id} if database_id else {},
-            status_code=503
+            details={"database_id": database_id} if database_id else None
         )
 
 class SchemaAnalysisError(SQLAIException):
     """Schema analysis related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "SCHEMA_ANALYSIS_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(self, message: str, table: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="SCHEMA_ANALYSIS_ERROR",
-            details={"table": table} if table else {},
-            status_code=500
+            details={"table": table} if table else None
         )
 
 class QueryGenerationError(SQLAIException):
     """Query generation related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "QUERY_GENERATION_ERROR"
+    _STATUS_CODE = 400
+    
     def __init__(self, message: str, natural_query: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="QUERY_GENERATION_ERROR",
-            details={"natural_query": natural_query} if natural_query else {},
-            status_code=400
+            details={"natural_query": natural_query} if natural_query else None
         )
 
 class QueryExecutionError(SQLAIException):
     """Query execution related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "QUERY_EXECUTION_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(self, message: str, sql: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="QUERY_EXECUTION_ERROR",
-            details={"sql": sql} if sql else {},
-            status_code=500
+            details={"sql": sql} if sql else None
         )
 
 class ValidationError(SQLAIException):
     """Input validation errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "VALIDATION_ERROR"
+    _STATUS_CODE = 400
+    
     def __init__(self, message: str, field: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="VALIDATION_ERROR",
-            details={"field": field} if field else {},
-            status_code=400
+            details={"field": field} if field else None
         )
 
 class AuthenticationError(SQLAIException):
     """Authentication related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "AUTHENTICATION_ERROR"
+    _STATUS_CODE = 401
+    
     def __init__(self, message: str):
-        super().__init__(
-            message=message,
-            error_code="AUTHENTICATION_ERROR",
-            status_code=401
-        )
+        super().__init__(message=message)
 
 class AuthorizationError(SQLAIException):
     """Authorization related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "AUTHORIZATION_ERROR"
+    _STATUS_CODE = 403
+    
     def __init__(self, message: str, resource: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="AUTHORIZATION_ERROR",
-            details={"resource": resource} if resource else {},
-            status_code=403
+            details={"resource": resource} if resource else None
         )
 
 class ResourceNotFoundError(SQLAIException):
     """Resource not found errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "RESOURCE_NOT_FOUND"
+    _STATUS_CODE = 404
+    
     def __init__(self, resource_type: str, resource_id: str):
         super().__init__(
             message=f"{resource_type} with id '{resource_id}' not found",
-            error_code="RESOURCE_NOT_FOUND",
-            details={"resource_type": resource_type, "resource_id": resource_id},
-            status_code=404
+            details={"resource_type": resource_type, "resource_id": resource_id}
         )
 
 class ConfigurationError(SQLAIException):
     """Configuration related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "CONFIGURATION_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(self, message: str, config_key: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="CONFIGURATION_ERROR",
-            details={"config_key": config_key} if config_key else {},
-            status_code=500
+            details={"config_key": config_key} if config_key else None
         )
 
 class RateLimitError(SQLAIException):
     """Rate limiting errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "RATE_LIMIT_EXCEEDED"
+    _STATUS_CODE = 429
+    
     def __init__(self, message: str = "Rate limit exceeded", retry_after: Optional[int] = None):
         super().__init__(
             message=message,
-            error_code="RATE_LIMIT_EXCEEDED",
-            details={"retry_after": retry_after} if retry_after else {},
-            status_code=429
+            details={"retry_after": retry_after} if retry_after else None
         )
 
 class TimeoutError(SQLAIException):
     """Operation timeout errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "TIMEOUT_ERROR"
+    _STATUS_CODE = 504
+    
     def __init__(self, message: str, operation: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="TIMEOUT_ERROR",
-            details={"operation": operation} if operation else {},
-            status_code=504
+            details={"operation": operation} if operation else None
         )
 
 class CacheError(SQLAIException):
     """Cache related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "CACHE_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(self, message: str, cache_key: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="CACHE_ERROR",
-            details={"cache_key": cache_key} if cache_key else {},
-            status_code=500
+            details={"cache_key": cache_key} if cache_key else None
         )
 
 class AIModelError(SQLAIException):
     """AI model related errors"""
     
+    __slots__ = ()
+    _ERROR_CODE = "AI_MODEL_ERROR"
+    _STATUS_CODE = 500
+    
     def __init__(self, message: str, model_name: Optional[str] = None):
         super().__init__(
             message=message,
-            error_code="AI_MODEL_ERROR",
-            details={"model_name": model_name} if model_name else {},
-            status_code=500
+            details={"model_name": model_name} if model_name else None
         )
\ No newline at end of file
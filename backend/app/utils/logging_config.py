@@ -1,13 +1,16 @@
 """
 Logging configuration for SQLAI application
 """
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import queue
 import sys
+import time
 from pathlib import Path
-from typing import Dict, Any
-import json
-from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+import orjson
 
 from app.config import settings
 
@@ -15,12 +18,20 @@ from app.config import settings
 LOGS_DIR = Path("logs")
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Records held in memory before a file handler writes them out
+LOG_BUFFER_CAPACITY = 512
+# Seconds between flushes of buffered records, so a quiet process still gets
+# its recent logs on disk; a crash loses at most this much buffered output
+LOG_FLUSH_INTERVAL = 5.0
+
 class JSONFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging"""
     
     def format(self, record: logging.LogRecord) -> str:
         log_obj = {
-            "timestamp": datetime.utcnow().isoformat(),
+            # Epoch nanoseconds from when the record was created, not when the
+            # listener thread gets around to formatting it
+            "ts_ns": int(record.created * 1_000_000_000),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -37,7 +48,90 @@ class JSONFormatter(logging.Formatter):
         if record.exc_info:
             log_obj["exception"] = self.formatException(record.exc_info)
         
-        return json.dumps(log_obj)
+        return orjson.dumps(log_obj, default=str).decode()
+
+class QueueDispatchHandler(logging.handlers.QueueHandler):
+    """Queues records together with the handlers that should write them"""
+    
+    def __init__(self, log_queue: queue.SimpleQueue, target_handlers: Tuple[logging.Handler, ...]):
+        super().__init__(log_queue)
+        self.target_handlers = target_handlers
+    
+    def prepare(self, record: logging.LogRecord):
+        # The listener runs in this process, so the record is passed through unformatted
+        return record, self.target_handlers
+
+class QueueDispatchListener(logging.handlers.QueueListener):
+    """Writes queued records to their own handlers on a background thread"""
+    
+    def __init__(self, log_queue: queue.SimpleQueue,
+                 buffered_handlers: Tuple[logging.handlers.MemoryHandler, ...] = ()):
+        super().__init__(log_queue)
+        self.buffered_handlers = buffered_handlers
+        self._next_flush = time.monotonic() + LOG_FLUSH_INTERVAL
+    
+    def dequeue(self, block):
+        # Wake up at least once per interval to flush the buffered handlers,
+        # whether or not records keep arriving
+        while True:
+            timeout = self._next_flush - time.monotonic()
+            if timeout > 0:
+                try:
+                    return self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+            self._flush_buffers()
+    
+    def _flush_buffers(self):
+        """Write out buffered records (runs on the listener thread)"""
+        for handler in self.buffered_handlers:
+            handler.flush()
+        self._next_flush = time.monotonic() + LOG_FLUSH_INTERVAL
+    
+    def handle(self, item):
+        record, target_handlers = item
+        for handler in target_handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+_log_listener: Optional[QueueDispatchListener] = None
+
+def _stop_log_listener():
+    """Flush queued records to the current handlers and stop the listener"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+atexit.register(_stop_log_listener)
+
+def _start_log_listener(logger_names):
+    """
+    Move the configured handlers behind a queue so callers only enqueue records
+    
+    Args:
+        logger_names: Names of the configured loggers (root is always included)
+    """
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    queue_handlers: Dict[Tuple[logging.Handler, ...], QueueDispatchHandler] = {}
+    buffered_handlers = set()
+    
+    for logger in [logging.getLogger()] + [logging.getLogger(name) for name in logger_names]:
+        target_handlers = tuple(logger.handlers)
+        if not target_handlers:
+            continue
+        # Loggers with the same handlers share one queue handler
+        if target_handlers not in queue_handlers:
+            queue_handlers[target_handlers] = QueueDispatchHandler(log_queue, target_handlers)
+        logger.handlers = [queue_handlers[target_handlers]]
+        buffered_handlers.update(
+            handler for handler in target_handlers
+            if isinstance(handler, logging.handlers.MemoryHandler)
+        )
+    
+    _log_listener = QueueDispatchListener(log_queue, tuple(buffered_handlers))
+    _log_listener.start()
 
 def get_logging_config() -> Dict[str, Any]:
     """
@@ -68,15 +162,16 @@ def get_logging_config() -> Dict[str, Any]:
                 "formatter": "default",
                 "stream": "ext://sys.stdout"
             },
-            "file_app": {
+            "file_app_raw": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": log_level,
                 "formatter": "detailed",
                 "filename": str(LOGS_DIR / "app.log"),
-                "maxBytes": 10485760,  # 10MB
+                "maxBytes": 268435456,  # 256MB, fewer rollovers on the busiest logs
                 "backupCount": 5,
                 "encoding": "utf-8"
             },
+            # Every record reaching error.log is an ERROR, so it is written directly
             "file_error": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "ERROR",
@@ -86,16 +181,16 @@ def get_logging_config() -> Dict[str, Any]:
                 "backupCount": 5,
                 "encoding": "utf-8"
             },
-            "file_query": {
+            "file_query_raw": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "INFO",
                 "formatter": "json",
                 "filename": str(LOGS_DIR / "query.log"),
-                "maxBytes": 10485760,  # 10MB
+                "maxBytes": 268435456,  # 256MB, fewer rollovers on the busiest logs
                 "backupCount": 5,
                 "encoding": "utf-8"
             },
-            "file_security": {
+            "file_security_raw": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "level": "WARNING",
                 "formatter": "json",
@@ -103,6 +198,30 @@ def get_logging_config() -> Dict[str, Any]:
                 "maxBytes": 10485760,  # 10MB
                 "backupCount": 5,
                 "encoding": "utf-8"
+            },
+            
+            # Buffer file writes and flush them in batches, immediately on ERROR
+            # and otherwise every LOG_FLUSH_INTERVAL seconds (see QueueDispatchListener)
+            "file_app": {
+                "class": "logging.handlers.MemoryHandler",
+                "level": log_level,
+                "capacity": LOG_BUFFER_CAPACITY,
+                "flushLevel": logging.ERROR,
+                "target": "file_app_raw"
+            },
+            "file_query": {
+                "class": "logging.handlers.MemoryHandler",
+                "level": "INFO",
+                "capacity": LOG_BUFFER_CAPACITY,
+                "flushLevel": logging.ERROR,
+                "target": "file_query_raw"
+            },
+            "file_security": {
+                "class": "logging.handlers.MemoryHandler",
+                "level": "WARNING",
+                "capacity": LOG_BUFFER_CAPACITY,
+                "flushLevel": logging.ERROR,
+                "target": "file_security_raw"
             }
         },
         "loggers": {
@@ -187,8 +306,13 @@ def setup_logging():
     Setup logging configuration
     """
     config = get_logging_config()
+    # Drain records queued for the old handlers before dictConfig closes them
+    _stop_log_listener()
     logging.config.dictConfig(config)
     
+    # File and console writes happen on the listener thread, not the event loop
+    _start_log_listener(config["loggers"])
+    
     # Get root logger
     logger = logging.getLogger()
     logger.info("Logging system initialized")
@@ -201,14 +325,18 @@ def setup_logging():
     app_logger.info(f"Debug mode: {settings.debug}")
     app_logger.info(f"Version: {settings.app_version}")
 
-# Custom loggers for specific purposes
+# Custom loggers for specific purposes, resolved once
+_query_logger = logging.getLogger("query")
+_security_logger = logging.getLogger("security")
+_services_logger = logging.getLogger("app.services")
+
 def get_query_logger():
     """Get logger for query operations"""
-    return logging.getLogger("query")
+    return _query_logger
 
 def get_security_logger():
     """Get logger for security events"""
-    return logging.getLogger("security")
+    return _security_logger
 
 def log_query_execution(
     database_id: str,
@@ -222,7 +350,9 @@ def log_query_execution(
     """
     Log query execution details
     """
-    query_logger = get_query_logger()
+    query_logger = _query_logger
+    if not query_logger.isEnabledFor(logging.INFO):
+        return
     query_logger.info(
         "Query executed",
         extra={
@@ -246,7 +376,9 @@ def log_security_event(
     """
     Log security events
     """
-    security_logger = get_security_logger()
+    security_logger = _security_logger
+    if not security_logger.isEnabledFor(logging.WARNING):
+        return
     security_logger.warning(
         message,
         extra={
@@ -267,8 +399,10 @@ def log_database_connection(
     """
     Log database connection attempts
     """
-    logger = logging.getLogger("app.services")
+    logger = _services_logger
     if status == "success":
+        if not logger.isEnabledFor(logging.INFO):
+            return
         logger.info(
             f"Database connection successful",
             extra={
@@ -298,7 +432,9 @@ def log_schema_analysis(
     """
     Log schema analysis results
     """
-    logger = logging.getLogger("app.services")
+    logger = _services_logger
+    if not logger.isEnabledFor(logging.INFO):
+        return
     logger.info(
         f"Schema analysis completed",
         extra={
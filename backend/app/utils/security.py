@@ -3,16 +3,71 @@ Security utilities for credential encryption and management
 """
 import os
 import base64
-import json
+import hashlib
+import orjson
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import logging
 
 logger = logging.getLogger(__name__)
 
+# AES-GCM tokens carry this prefix; older tokens are base64-wrapped Fernet tokens
+AESGCM_TOKEN_PREFIX = 'v2:'
+AESGCM_NONCE_SIZE = 12
+# HKDF context separating the AES-GCM key from the legacy Fernet key
+AESGCM_KEY_INFO = b'sqlai-credentials-aes-gcm-v2'
+
+# PBKDF2 parameters for master keys that aren't raw 32-byte keys
+KDF_SALT = b'sqlai_salt_2024'  # In production, use random salt per credential
+KDF_ITERATIONS = 100000
+
+@lru_cache(maxsize=4)
+def _derive_key(master_key: str) -> bytes:
+    """
+    Derive the 32-byte encryption key from master key
+    
+    Cached so every CredentialManager built with the same master key
+    reuses one PBKDF2 run.
+    
+    Args:
+        master_key: Master key or base64-encoded 32-byte key
+        
+    Returns:
+        Raw 32-byte key
+    """
+    try:
+        # Try to use the key directly if it's already a valid Fernet key
+        key_bytes = base64.urlsafe_b64decode(master_key.encode())
+        if len(key_bytes) == 32:
+            return key_bytes
+    except Exception:
+        pass
+    
+    # Derive key from password using PBKDF2
+    return hashlib.pbkdf2_hmac('sha256', master_key.encode(), KDF_SALT, KDF_ITERATIONS, 32)
+
+@lru_cache(maxsize=4)
+def _derive_aesgcm_key(master_key: str) -> bytes:
+    """
+    Derive the AES-GCM key, distinct from the legacy Fernet key
+    
+    Args:
+        master_key: Master key or base64-encoded 32-byte key
+        
+    Returns:
+        Raw 32-byte key
+    """
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=AESGCM_KEY_INFO
+    ).derive(_derive_key(master_key))
+
 class CredentialManager:
     """Manages encryption and decryption of database credentials"""
     
@@ -29,34 +84,27 @@ class CredentialManager:
         if self.master_key == 'sqlai-fixed-master-key-2024-v1':
             logger.info("Using fixed master key for credential encryption")
         
-        self.cipher = self._create_cipher(self.master_key)
+        self.cipher = AESGCM(_derive_aesgcm_key(self.master_key))
+        # Fernet cipher, only for reading tokens stored before AES-GCM
+        self.fernet = Fernet(base64.urlsafe_b64encode(_derive_key(self.master_key)))
     
     def _generate_master_key(self) -> str:
         """Generate a new master key"""
         key = Fernet.generate_key()
         return base64.urlsafe_b64encode(key).decode('utf-8')
     
-    def _create_cipher(self, master_key: str) -> Fernet:
-        """Create a Fernet cipher from master key"""
-        try:
-            # Try to use the key directly if it's already a valid Fernet key
-            key_bytes = base64.urlsafe_b64decode(master_key.encode())
-            if len(key_bytes) == 32:
-                return Fernet(base64.urlsafe_b64encode(key_bytes))
-        except Exception:
-            pass
-        
-        # Derive key from password using PBKDF2
-        salt = b'sqlai_salt_2024'  # In production, use random salt per credential
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend()
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_key.encode()))
-        return Fernet(key)
+    def _encrypt_bytes(self, data: bytes) -> str:
+        """Encrypt bytes into a prefixed, single base64-encoded AES-GCM token"""
+        nonce = os.urandom(AESGCM_NONCE_SIZE)
+        encrypted = self.cipher.encrypt(nonce, data, None)
+        return AESGCM_TOKEN_PREFIX + base64.urlsafe_b64encode(nonce + encrypted).decode('ascii')
+    
+    def _decrypt_token(self, token: str) -> bytes:
+        """Decrypt an AES-GCM token, or a base64-wrapped Fernet token stored before AES-GCM"""
+        if token.startswith(AESGCM_TOKEN_PREFIX):
+            raw = base64.urlsafe_b64decode(token[len(AESGCM_TOKEN_PREFIX):])
+            return self.cipher.decrypt(raw[:AESGCM_NONCE_SIZE], raw[AESGCM_NONCE_SIZE:], None)
+        return self.fernet.decrypt(base64.urlsafe_b64decode(token.encode()))
     
     def encrypt_credentials(self, credentials: Dict[str, Any]) -> str:
         """
@@ -69,9 +117,7 @@ class CredentialManager:
             Encrypted credentials as base64 string
         """
         try:
-            json_str = json.dumps(credentials)
-            encrypted = self.cipher.encrypt(json_str.encode())
-            return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+            return self._encrypt_bytes(orjson.dumps(credentials))
         except Exception as e:
             logger.error(f"Failed to encrypt credentials: {e}")
             raise
@@ -87,9 +133,7 @@ class CredentialManager:
             Decrypted credentials dictionary
         """
         try:
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_creds.encode())
-            decrypted = self.cipher.decrypt(encrypted_bytes)
-            return json.loads(decrypted.decode())
+            return orjson.loads(self._decrypt_token(encrypted_creds))
         except Exception as e:
             logger.error(f"Failed to decrypt credentials: {e}")
             raise
@@ -105,8 +149,7 @@ class CredentialManager:
             Encrypted password as base64 string
         """
         try:
-            encrypted = self.cipher.encrypt(password.encode())
-            return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+            return self._encrypt_bytes(password.encode())
         except Exception as e:
             logger.error(f"Failed to encrypt password: {e}")
             raise
@@ -122,9 +165,7 @@ class CredentialManager:
             Decrypted password
         """
         try:
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_password.encode())
-            decrypted = self.cipher.decrypt(encrypted_bytes)
-            return decrypted.decode()
+            return self._decrypt_token(encrypted_password).decode()
         except Exception as e:
             logger.error(f"Failed to decrypt password: {e}")
             raise
@@ -3,11 +3,22 @@ SQL validation and sanitization utilities for preventing SQL injection
 """
 import re
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+from typing import Dict, List, Any, Optional, Set, Tuple
 from enum import Enum
 
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Encoding tricks checked alongside the dangerous patterns
+HEX_RE = re.compile(r'0x[0-9a-fA-F]+')
+CHAR_RE = re.compile(r'CHAR\s*\(\s*\d+', re.IGNORECASE)
+
 class SQLOperation(Enum):
     """Allowed SQL operations"""
     SELECT = "SELECT"
@@ -41,6 +52,11 @@ class SQLValidator:
         r"SLEEP\s*\(",
     ]
     
+    # Compiled once, paired with the pattern text reported on a match
+    _COMPILED_PATTERNS = [(pattern, re.compile(pattern, re.IGNORECASE)) for pattern in DANGEROUS_PATTERNS]
+    # All patterns as one alternation, so clean queries are scanned once
+    _COMBINED_PATTERN = re.compile("|".join(f"(?:{pattern})" for pattern in DANGEROUS_PATTERNS), re.IGNORECASE)
+    
     # Allowed table/column name pattern
     VALID_IDENTIFIER = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
     
@@ -106,8 +122,12 @@ class SQLValidator:
         Returns:
             True if dangerous patterns found
         """
-        detected = cls.detect_injection_patterns(query)
-        return len(detected) > 0
+        return (
+            cls._COMBINED_PATTERN.search(query) is not None
+            or query.count(';') > 1
+            or HEX_RE.search(query) is not None
+            or CHAR_RE.search(query) is not None
+        )
     
     @classmethod
     def detect_dangerous_patterns(cls, query: str) -> List[str]:
@@ -126,22 +146,33 @@ class SQLValidator:
             List of detected dangerous patterns
         """
         detected = []
-        query_upper = query.upper()
         
-        for pattern in cls.DANGEROUS_PATTERNS:
-            if re.search(pattern, query_upper, re.IGNORECASE):
-                detected.append(pattern)
+        if _HYPERSCAN_DB is not None:
+            # One linear pass reports every pattern, overlapping matches included
+            matched: Set[int] = set()
+            with _hyperscan_lock:
+                _HYPERSCAN_DB.scan(
+                    query.encode('utf-8', errors='replace'),
+                    match_event_handler=_on_hyperscan_match,
+                    context=matched
+                )
+            detected = [pattern for i, pattern in enumerate(cls.DANGEROUS_PATTERNS) if i in matched]
+        
+        # Matches can overlap (a block comment may hide a UNION SELECT), so once
+        # the combined scan hits, each pattern is checked to report all of them
+        elif cls._COMBINED_PATTERN.search(query):
+            detected = [pattern for pattern, compiled in cls._COMPILED_PATTERNS if compiled.search(query)]
         
         # Check for multiple SQL statements
         if query.count(';') > 1:
             detected.append("Multiple semicolons detected")
         
         # Check for hex encoding attempts
-        if re.search(r'0x[0-9a-fA-F]+', query):
+        if HEX_RE.search(query):
             detected.append("Hex encoding detected")
         
         # Check for char() function abuse
-        if re.search(r'CHAR\s*\(\s*\d+', query_upper):
+        if CHAR_RE.search(query):
             detected.append("CHAR() function detected")
         
         return detected
@@ -302,6 +333,43 @@ class SQLValidator:
         
         return safe_limit, safe_offset
 
+def _build_hyperscan_database(patterns: List[str]):
+    """
+    Compile the dangerous patterns into one Hyperscan block-mode database
+    
+    Args:
+        patterns: Regex patterns, matched case-insensitively
+        
+    Returns:
+        Compiled database, or None if Hyperscan is unavailable or rejects a pattern
+    """
+    if not HYPERSCAN_AVAILABLE:
+        return None
+    
+    try:
+        database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        database.compile(
+            expressions=[pattern.encode() for pattern in patterns],
+            ids=list(range(len(patterns))),
+            # UTF8/UCP keep \s and case folding in line with Python's re on str
+            flags=[
+                hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+                | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+            ] * len(patterns)
+        )
+        return database
+    except Exception as e:
+        logger.warning(f"Hyperscan compile failed, using re for SQL pattern checks: {e}")
+        return None
+
+def _on_hyperscan_match(pattern_id: int, start: int, end: int, flags: int, matched: Set[int]):
+    """Record which pattern matched and keep scanning"""
+    matched.add(pattern_id)
+
+_HYPERSCAN_DB = _build_hyperscan_database(SQLValidator.DANGEROUS_PATTERNS)
+# A database owns one scratch space, so scans are serialized
+_hyperscan_lock = threading.Lock()
+
 class QueryBuilder:
     """Safe SQL query builder"""
     
@@ -6,7 +6,8 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.utils.security import CredentialManager
+from cryptography.exceptions import InvalidTag
+from app.utils.security import CredentialManager, _derive_key, _derive_aesgcm_key
 from app.services.database_service import DatabaseService
 
 def test_credential_encryption():
@@ -45,6 +46,63 @@ def test_credential_encryption():
     
     print("\n✅ Credential encryption tests passed!")
 
+# Tokens written by the Fernet-only CredentialManager for master key
+# "test_master_key_123", before AES-GCM tokens were introduced
+LEGACY_PASSWORD_TOKEN = (
+    "Z0FBQUFBQnEwVjl0RnpXSnpPUUtpclBhTXNOSVNOX1pCT0VmalRaQV93RXJiWFR3UF96Nkx3SlRxWjREWExldUQ5"
+    "eS10MEJRbXl4WVRHc1JtWVFxQnpndW9QcHBpS2JheWc9PQ=="
+)
+LEGACY_CREDENTIALS_TOKEN = (
+    "Z0FBQUFBQnEwVjl0cU5jeDNuR19MMFVLRTU3NWpCdlhpQlUxM095WExLNmJiNkRYOVduRHZxVVVRbFV3TklEMnp5"
+    "ZlVFNFVaangxdjFUc0hNeDluRmloUlBQcGx5MWNtUDdZMzBOeGVucXhmUVNHS29CQjdnQ2Ytb3BSX2pOSlp0U1ZU"
+    "c2dJbmwwbmo5UllCM2JIZ2RXbTNEOUx4Q2JpRk82QnhnNUNmamhuU1g5WjZQYlczX0g1am1ZNG50czViYUtCT0dk"
+    "amNyOWxj"
+)
+
+def test_aesgcm_token_round_trip():
+    """Test that new tokens are AES-GCM (v2) tokens and decrypt back"""
+    print("\nTesting AES-GCM Token Round Trip...")
+    
+    manager = CredentialManager("test_master_key_123")
+    
+    encrypted = manager.encrypt_password("myuser01")
+    assert encrypted.startswith("v2:"), "New tokens should be AES-GCM (v2) tokens!"
+    assert manager.decrypt_password(encrypted) == "myuser01", "v2 password round trip failed!"
+    
+    creds = {"host": "localhost", "port": 5432, "username": "myuser", "password": "myuser01"}
+    encrypted_creds = manager.encrypt_credentials(creds)
+    assert encrypted_creds.startswith("v2:"), "New tokens should be AES-GCM (v2) tokens!"
+    assert manager.decrypt_credentials(encrypted_creds) == creds, "v2 credentials round trip failed!"
+    
+    # The AES-GCM key must not be the legacy Fernet key
+    assert _derive_aesgcm_key("test_master_key_123") != _derive_key("test_master_key_123"), \
+        "AES-GCM and Fernet must use separate keys!"
+    
+    # Another master key must not decrypt the token
+    try:
+        CredentialManager("another_master_key").decrypt_password(encrypted)
+        raise AssertionError("Token decrypted with the wrong master key!")
+    except InvalidTag:
+        pass
+    
+    print("✅ AES-GCM token tests passed!")
+
+def test_legacy_fernet_token():
+    """Test that tokens stored before AES-GCM still decrypt"""
+    print("\nTesting Legacy Fernet Tokens...")
+    
+    manager = CredentialManager("test_master_key_123")
+    
+    assert manager.decrypt_password(LEGACY_PASSWORD_TOKEN) == "myuser01", "Legacy password decryption failed!"
+    assert manager.decrypt_credentials(LEGACY_CREDENTIALS_TOKEN) == {
+        "host": "localhost",
+        "port": 5432,
+        "username": "myuser",
+        "password": "myuser01"
+    }, "Legacy credentials decryption failed!"
+    
+    print("✅ Legacy Fernet token tests passed!")
+
 def test_database_service():
     """Test database service"""
     print("\nTesting Database Service...")
@@ -97,5 +155,7 @@ def test_database_service():
 
 if __name__ == "__main__":
     test_credential_encryption()
+    test_aesgcm_token_round_trip()
+    test_legacy_fernet_token()
     test_database_service()
     print("\n🎉 All tests passed!")
\ No newline at end of file
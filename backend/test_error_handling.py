@@ -6,9 +6,12 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+import copy
 import logging
+import pickle
 from app.utils.logging_config import setup_logging, log_query_execution, log_security_event
 from app.utils.exceptions import (
+    SQLAIException,
     DatabaseConnectionError,
     ValidationError,
     QueryExecutionError,
@@ -104,6 +107,29 @@ def test_custom_exceptions():
         print(f"   Status Code: {e.status_code}")
         print(f"   Details: {e.details}")
 
+def test_exception_pickling():
+    """Test that exceptions survive pickle and copy with all their fields"""
+    print("\n\nTesting Exception Pickling...")
+    print("=" * 60)
+    
+    exceptions = [
+        DatabaseConnectionError("boom", "db1"),
+        SQLAIException("x", error_code="CUSTOM", status_code=418),
+        ResourceNotFoundError(resource_type="Database", resource_id="db-123"),
+        ValidationError(message="Invalid input")
+    ]
+    
+    for original in exceptions:
+        for restore in (lambda e: pickle.loads(pickle.dumps(e)), copy.copy, copy.deepcopy):
+            restored = restore(original)
+            assert type(restored) is type(original), "Exception type changed!"
+            assert restored.args == original.args, "Exception args changed!"
+            assert restored.message == original.message, "Message changed!"
+            assert restored.error_code == original.error_code, "Error code changed!"
+            assert restored.status_code == original.status_code, "Status code changed!"
+            assert dict(restored.details) == dict(original.details), "Details changed!"
+        print(f"✅ {type(original).__name__} round-trips ({original.error_code}, {original.status_code})")
+
 def test_query_logging():
     """Test query execution logging"""
     print("\n\nTesting Query Logging...")
@@ -247,6 +273,7 @@ if __name__ == "__main__":
         # Run tests
         test_logging_setup()
         test_custom_exceptions()
+        test_exception_pickling()
         test_query_logging()
         test_security_logging()
         test_error_propagation()
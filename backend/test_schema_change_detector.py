@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the snapshot hash short-circuit in SchemaChangeDetector
+Inspector and snapshot storage are mocked; no database needed
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import unittest
+from unittest.mock import Mock, patch
+
+from app.services.schema_change_detector import SchemaChangeDetector
+
+SCHEMA_INFO = {
+    'schemas': {
+        'public': {
+            'tables': [
+                {
+                    'name': 'users',
+                    'columns': [
+                        {'name': 'id', 'type': 'integer', 'nullable': False, 'is_primary_key': True},
+                        {'name': 'email', 'type': 'varchar'}
+                    ],
+                    'indexes': [{'name': 'users_pkey', 'is_primary': True, 'is_unique': True}]
+                }
+            ],
+            'relationships': []
+        }
+    }
+}
+
+def make_detector(schema_info=SCHEMA_INFO):
+    """Build a detector whose inspector returns the given schema"""
+    detector = SchemaChangeDetector.__new__(SchemaChangeDetector)
+    detector.inspector = Mock()
+    detector.inspector.analyze_schema.return_value = schema_info
+    detector.cache_service = Mock()
+    return detector
+
+class TestSnapshotHashShortCircuit(unittest.TestCase):
+    """detect_changes skips loading schema_json while the stored hash matches"""
+
+    def test_hash_ignores_timestamp(self):
+        detector = make_detector()
+        first = detector.capture_current_schema('db1', '2024-01-01T00:00:00')
+        second = detector.capture_current_schema('db1', '2024-06-01T00:00:00')
+        self.assertEqual(first['schema_hash'], second['schema_hash'])
+
+    def test_matching_hash_skips_snapshot_load(self):
+        detector = make_detector()
+        current_hash = detector.capture_current_schema('db1')['schema_hash']
+
+        with patch.object(detector, '_load_last_snapshot_hash', return_value=current_hash), \
+             patch.object(detector, '_load_last_snapshot') as load_snapshot, \
+             patch.object(detector, '_save_snapshot') as save_snapshot:
+            changes = detector.detect_changes('db1')
+
+        self.assertFalse(changes['has_changes'])
+        load_snapshot.assert_not_called()
+        save_snapshot.assert_not_called()
+
+    def test_stale_hash_without_changes_is_refreshed(self):
+        detector = make_detector()
+        # Same structure stored under a hash from an older format
+        stored_schema = detector.capture_current_schema('db1')
+
+        with patch.object(detector, '_load_last_snapshot_hash', return_value='old-format-hash'), \
+             patch.object(detector, '_load_last_snapshot', return_value=stored_schema), \
+             patch.object(detector, '_save_snapshot') as save_snapshot, \
+             patch.object(detector, '_refresh_last_snapshot') as refresh_snapshot:
+            changes = detector.detect_changes('db1')
+
+        self.assertFalse(changes['has_changes'])
+        save_snapshot.assert_not_called()
+        refresh_snapshot.assert_called_once()
+        db_id, refreshed = refresh_snapshot.call_args.args
+        self.assertEqual(db_id, 'db1')
+        self.assertEqual(refreshed['schema_hash'], stored_schema['schema_hash'])
+
+    def test_changed_schema_saves_snapshot(self):
+        stored_schema = make_detector().capture_current_schema('db1')
+
+        changed_info = {
+            'schemas': {
+                'public': {
+                    'tables': SCHEMA_INFO['schemas']['public']['tables'] + [
+                        {'name': 'orders', 'columns': [{'name': 'id', 'type': 'integer'}], 'indexes': []}
+                    ],
+                    'relationships': []
+                }
+            }
+        }
+        detector = make_detector(changed_info)
+
+        with patch.object(detector, '_load_last_snapshot_hash', return_value=stored_schema['schema_hash']), \
+             patch.object(detector, '_load_last_snapshot', return_value=stored_schema), \
+             patch.object(detector, '_save_snapshot') as save_snapshot, \
+             patch.object(detector, '_refresh_last_snapshot') as refresh_snapshot:
+            changes = detector.detect_changes('db1')
+
+        self.assertTrue(changes['has_changes'])
+        save_snapshot.assert_called_once()
+        refresh_snapshot.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test incremental schema indexing in SchemaContextService
+Uses an in-memory stand-in for the Chroma collection; no server or model needed
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import unittest
+from collections import deque
+from unittest.mock import Mock
+
+from app.services.schema_context_service import SchemaContextService, SCHEMA_ELEMENT_TYPES
+
+class FakeCollection:
+    """Minimal in-memory collection supporting the calls made by index_schema"""
+
+    def __init__(self):
+        self.records = {}  # id -> (document, metadata)
+        self.upserted_ids = []
+
+    def _matches(self, metadata, where):
+        if not where:
+            return True
+        for key, condition in where.items():
+            if isinstance(condition, dict) and '$in' in condition:
+                if metadata.get(key) not in condition['$in']:
+                    return False
+            elif metadata.get(key) != condition:
+                return False
+        return True
+
+    def get(self, where=None, include=None):
+        return {'ids': [doc_id for doc_id, (_, metadata) in self.records.items()
+                        if self._matches(metadata, where)]}
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            for doc_id in ids:
+                self.records.pop(doc_id, None)
+        else:
+            for doc_id in self.get(where=where)['ids']:
+                del self.records[doc_id]
+
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self.upserted_ids.extend(ids)
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.records[doc_id] = (document, metadata)
+
+    def count(self):
+        return len(self.records)
+
+def make_service(collection):
+    """Build a service around a fake collection without touching Chroma or the graph"""
+    service = SchemaContextService.__new__(SchemaContextService)
+    service.db_id = "test-db"
+    service.collection = collection
+    service.embedding_fn = lambda documents: [[0.0] for _ in documents]
+    service._indexed_hash = None
+    service._collection_size = None
+    service._query_cache = deque(maxlen=8)
+    service._query_cache_lock = threading.Lock()
+
+    stored = {}
+    service.cache_service = Mock()
+    service.cache_service.get_cache.side_effect = lambda key, cache_type=None: stored.get(key)
+    service.cache_service.set_cache.side_effect = (
+        lambda key, data, cache_type=None, ttl=None: stored.__setitem__(key, data)
+    )
+    return service
+
+def make_schema(tables):
+    """Schema in analyzer format; tables maps table name -> list of column names"""
+    return {
+        'schemas': {
+            'public': {
+                'tables': [
+                    {
+                        'name': name,
+                        'columns': [{'name': column, 'type': 'integer'} for column in columns]
+                    }
+                    for name, columns in tables.items()
+                ],
+                'relationships': []
+            }
+        }
+    }
+
+class TestIncrementalIndexing(unittest.TestCase):
+    """Reindexing writes only changed elements and removes dropped ones"""
+
+    def test_unchanged_elements_are_not_rewritten(self):
+        collection = FakeCollection()
+        service = make_service(collection)
+
+        service.index_schema(make_schema({'users': ['id', 'name']}))
+        self.assertEqual(len(collection.records), 3)
+
+        collection.upserted_ids.clear()
+        service._indexed_hash = None
+        service.index_schema(make_schema({'users': ['id', 'name', 'email']}))
+
+        # Only the table (column count changed) and the new column are written
+        self.assertEqual(len(collection.upserted_ids), 2)
+        self.assertEqual(len(collection.records), 4)
+
+    def test_dropped_elements_are_removed(self):
+        collection = FakeCollection()
+        service = make_service(collection)
+
+        service.index_schema(make_schema({'users': ['id'], 'orders': ['id', 'user_id']}))
+        service.index_schema(make_schema({'users': ['id']}))
+
+        table_names = {metadata['table_name'] for _, metadata in collection.records.values()}
+        self.assertEqual(table_names, {'users'})
+        self.assertEqual(len(collection.records), 2)
+
+    def test_legacy_ids_are_removed_without_stored_index(self):
+        collection = FakeCollection()
+        # Elements indexed under the old readable ids, with no index metadata saved
+        collection.records = {
+            'table_public_users': ('Table: users', {'type': 'table', 'table_name': 'users'}),
+            'column_public_users_id': ('Column: id', {'type': 'column', 'table_name': 'users'}),
+            'rel_orders_user_id_users_id': ('Relationship', {'type': 'relationship'}),
+            'query_abc': ('Query', {'type': 'query_pattern'})
+        }
+        service = make_service(collection)
+
+        service.index_schema(make_schema({'users': ['id']}))
+
+        self.assertNotIn('table_public_users', collection.records)
+        self.assertNotIn('column_public_users_id', collection.records)
+        self.assertNotIn('rel_orders_user_id_users_id', collection.records)
+        # Query patterns are not schema elements and are kept
+        self.assertIn('query_abc', collection.records)
+
+        schema_elements = [metadata for _, metadata in collection.records.values()
+                           if metadata['type'] in SCHEMA_ELEMENT_TYPES]
+        self.assertEqual(len(schema_elements), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test WebSocket connection bookkeeping in ConnectionManager
+Uses in-memory sockets; no server needed
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.services.websocket_manager import ConnectionManager
+
+class FakeWebSocket:
+    """WebSocket stand-in recording sent frames"""
+
+    def __init__(self, fail_sends: bool = False):
+        self.state = SimpleNamespace()
+        self.accept = AsyncMock()
+        self.sent = []
+        self.fail_sends = fail_sends
+
+    async def send_text(self, payload: str):
+        if self.fail_sends:
+            raise RuntimeError("socket closed")
+        self.sent.append(payload)
+
+class TestConnectionIndexes(unittest.IsolatedAsyncioTestCase):
+    """The query_id and activity indexes follow connects and disconnects"""
+
+    async def test_query_progress_reaches_only_subscribers(self):
+        manager = ConnectionManager()
+        first, second, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(first, 'query_progress', query_id='q1')
+        await manager.connect(second, 'query_progress', query_id='q1')
+        await manager.connect(other, 'query_progress', query_id='q2')
+
+        await manager.send_query_progress('q1', 'running', 0.5, 10)
+
+        self.assertEqual(len(first.sent), 2)  # welcome + progress
+        self.assertEqual(len(second.sent), 2)
+        self.assertEqual(len(other.sent), 1)
+        self.assertEqual(manager.get_connection_stats()['active_queries'], 3)
+
+    async def test_disconnect_removes_socket_from_indexes(self):
+        manager = ConnectionManager()
+        first, second = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(first, 'query_progress', query_id='q1')
+        await manager.connect(second, 'query_progress', query_id='q1')
+
+        await manager.disconnect(first)
+        self.assertEqual(manager._by_query_id['q1'], {second})
+        self.assertNotIn(first, manager._activity_index)
+
+        # The last subscriber takes the query entry with it
+        await manager.disconnect(second)
+        self.assertNotIn('q1', manager._by_query_id)
+        self.assertEqual(len(manager._activity_index), 0)
+        self.assertEqual(manager.get_connection_stats()['total_connections'], 0)
+
+    async def test_failed_broadcast_disconnects_socket(self):
+        manager = ConnectionManager()
+        healthy, broken = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(healthy, 'system_notifications')
+        await manager.connect(broken, 'system_notifications')
+        broken.fail_sends = True
+
+        await manager.send_system_notification('maintenance', 'Restarting soon')
+
+        self.assertEqual(manager.active_connections['system_notifications'], {healthy})
+        self.assertNotIn(broken, manager._activity_index)
+
+    async def test_stale_cleanup_follows_activity_order(self):
+        manager = ConnectionManager()
+        idle, active = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(idle, 'system_notifications')
+        await manager.connect(active, 'system_notifications')
+
+        # Sending moves a socket to the back of the activity index
+        idle.state.meta.last_activity -= 3600
+        await manager.send_message(active, {'type': 'heartbeat'})
+        self.assertEqual(list(manager._activity_index), [idle, active])
+
+        await manager.cleanup_stale_connections(max_idle_minutes=30)
+
+        self.assertEqual(list(manager._activity_index), [active])
+        self.assertEqual(manager.active_connections['system_notifications'], {active})
+
+if __name__ == '__main__':
+    unittest.main()